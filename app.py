@@ -1,7 +1,23 @@
 import os
+import io
+import math
+import time
+import csv
+import atexit
+import weakref
+import asyncio
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash
+import functools
+from datetime import datetime
+from flask import (
+    Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, jsonify, Response,
+    session, stream_with_context, abort, g, before_render_template, template_rendered
+)
+import click
+from werkzeug.local import LocalProxy
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, String, cast, event, func, insert, literal, tuple_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from flask_login import (
     LoginManager,
     UserMixin,
@@ -10,47 +26,87 @@ from flask_login import (
     current_user,
     login_required
 )
-from flask_caching import Cache
-from flask_migrate import Migrate
-from dotenv import load_dotenv
-from serpapi import google_search  # Correct import based on your setup
-import openai
-from werkzeug.security import generate_password_hash, check_password_hash  # For password hashing
-from difflib import SequenceMatcher
+from config import Config
+from logging_setup import configure_logging
+from db_engine import configure_sqlite_engine, configure_sqlite_connections
+from cache_store import SQLiteCache, LRUCache
+from result_cache import ResultCache, make_result_key, normalize_query
+from rewrite_cache import RewriteCache, make_rewrite_key
+from search_pipeline import run_search_pipeline
+from prefetch import Prefetcher
+from serpapi_client import SerpApiClient, CircuitBreaker
+from singleflight import SingleFlight
+from rewrite_engine import RewriteEngine, RuleTier, LearnedTier, LLMTier
+from taxonomy import Taxonomy
+from batch_rewrite import read_pairs, write_results, personalize_batch
+from similarity import similarity
+from history_writer import HistoryWriter
+from suggest import Suggester
+from history_search import (
+    CREATE_INDEX_SQL, SET_RANK_SQL, CREATE_DELETE_TRIGGER_SQL,
+    result_documents, index_searches, search_history_index,
+)
+from http_cache import make_etag, matching_etag, template_version, choose_encoding, compress_response
+from password_hashing import PasswordHasher, HasherBusy
+import metrics
 
 # ---------------------------
-# Configuration and Setup
+# Extensions and Services
 # ---------------------------
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Initialize Flask app
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your_default_secret_key')  # Replace with a strong secret key
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'  # SQLite database
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Initialize Extensions
-db = SQLAlchemy(app)
-migrate = Migrate(app, db)
-cache = Cache(app, config={'CACHE_TYPE': 'simple'})
-login_manager = LoginManager(app)
-login_manager.login_view = 'login'  # Redirect to 'login' page if not authenticated
-
-# Configure Logging
-logging.basicConfig(
-    filename='app.log',
-    level=logging.DEBUG,  # Set to DEBUG for detailed logs during development
-    format='%(asctime)s %(levelname)s %(name)s %(message)s'
-)
+# Bound to an application by create_app()
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'  # Redirect to 'login' page if not authenticated
+bp = Blueprint('main', __name__, cli_group=None)
+
+logger = logging.getLogger(__name__)
 
-# Load API Keys
-openai.api_key = os.getenv('OPENAI_API_KEY')  # Ensure this is set in your .env file
-serpapi_api_key = os.getenv('SERPAPI_API_KEY')  # Ensure this is set in your .env file
+# Model and prompt used for personalisation; bump PROMPT_VERSION whenever the prompt changes
+# so cached rewrites from the old prompt are not reused.
+OPENAI_MODEL = "gpt-4o-mini"
+PROMPT_VERSION = 1
+
+class Services:
+    """
+    One app's clients, caches and background workers, built by init_services()
+    and kept in app.extensions['services'].
+    """
 
-if not serpapi_api_key:
-    raise ValueError("SERPAPI_API_KEY not found in environment variables.")
+    def shutdown(self):
+        """
+        Flush queued search-history rows and stop the password-hashing processes.
+        """
+        self.history_writer.stop()
+        self.password_hasher.shutdown()
+
+def current_service(name):
+    """
+    Proxy to the current app's service `name`, resolved through current_app on each use.
+    """
+    return LocalProxy(lambda: getattr(current_app.extensions['services'], name))
+
+serpapi_client = current_service('serpapi_client')
+result_cache = current_service('result_cache')
+rewrite_cache = current_service('rewrite_cache')
+taxonomy = current_service('taxonomy')
+serp_flight = current_service('serp_flight')
+rewrite_flight = current_service('rewrite_flight')
+prefetcher = current_service('prefetcher')
+user_cache = current_service('user_cache')
+rewrite_engine = current_service('rewrite_engine')
+history_writer = current_service('history_writer')
+suggester = current_service('suggester')
+page_cache = current_service('page_cache')
+password_hasher = current_service('password_hasher')
+
+# Every app's services that are still alive, shut down once at interpreter exit
+_live_services = weakref.WeakSet()
+
+@atexit.register
+def shutdown_services():
+    for services in list(_live_services):
+        services.shutdown()
 
 # ---------------------------
 # Database Models
@@ -62,14 +118,21 @@ class User(UserMixin, db.Model):
     username = db.Column(db.String(150), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)  # Hashed password
     preferences = db.Column(db.Text, nullable=True)  # User preferences
+    # Bumped by triggers whenever one of the user's searches is added or deleted (see history_version())
+    history_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # Bumped by a trigger whenever the columns above change (see load_user())
+    version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
 
     def set_password(self, password):
-        """Hash and set the user's password."""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set the user's password. Raises HasherBusy if hashing is saturated."""
+        # Not in Server-Timing: whether a hash ran would tell a client which usernames exist
+        with metrics.span('password_hash', server_timing=False):
+            self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        """Check hashed password."""
-        return check_password_hash(self.password_hash, password)
+        """Check hashed password. Raises HasherBusy if hashing is saturated."""
+        with metrics.span('password_hash', server_timing=False):
+            return password_hasher.verify(self.password_hash, password)
 
 class Search(db.Model):
     __tablename__ = 'search'  # Explicitly define table name
@@ -79,178 +142,622 @@ class Search(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     author = db.relationship('User', backref=db.backref('searches', lazy='dynamic'))
 
-# ---------------------------
-# Create the Database Tables
-# ---------------------------
+    __table_args__ = (
+        # Serves per-user history ordered newest first
+        db.Index('ix_search_author_timestamp', author_id, timestamp.desc()),
+    )
 
-with app.app_context():
-    db.create_all()
+class UserTerm(db.Model):
+    """
+    Per-user term frequencies, maintained incrementally as searches are recorded.
+    `weight` is log2 of the term's total weight: log2(count) unless time decay is
+    enabled, in which case recent searches count for more (see term_weight()).
+    """
+    __tablename__ = 'user_term'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    term = db.Column(db.String(100), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    weight = db.Column(db.Float, nullable=False, default=0.0)
+    last_seen = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_user_term_user_weight', 'user_id', 'weight'),
+    )
+
+# Full-text index over history (see history_search.py); created alongside the search table
+event.listen(Search.__table__, 'after_create', DDL(CREATE_INDEX_SQL))
+event.listen(Search.__table__, 'after_create', DDL(SET_RANK_SQL))
+event.listen(Search.__table__, 'after_create', DDL(CREATE_DELETE_TRIGGER_SQL))
+
+# Keep user.history_version current however rows reach or leave the search table
+HISTORY_VERSION_TRIGGERS_SQL = [
+    f"CREATE TRIGGER IF NOT EXISTS search_history_version_{event_name.lower()} AFTER {event_name} ON search BEGIN"
+    f" UPDATE \"user\" SET history_version = history_version + 1 WHERE id = {row}.author_id;"
+    " END"
+    for event_name, row in (('INSERT', 'new'), ('DELETE', 'old'))
+]
+for trigger_sql in HISTORY_VERSION_TRIGGERS_SQL:
+    event.listen(Search.__table__, 'after_create', DDL(trigger_sql))
+
+# Bump user.version on any change a CachedUser could be showing, whoever makes it
+USER_VERSION_TRIGGER_SQL = (
+    'CREATE TRIGGER IF NOT EXISTS user_version_update'
+    ' AFTER UPDATE OF username, password_hash, preferences ON "user" BEGIN'
+    ' UPDATE "user" SET version = version + 1 WHERE id = new.id;'
+    ' END'
+)
+event.listen(User.__table__, 'after_create', DDL(USER_VERSION_TRIGGER_SQL))
 
 # ---------------------------
 # User Loader for Flask-Login
 # ---------------------------
 
+class CachedUser(UserMixin):
+    """
+    Read-only snapshot of a User, served to Flask-Login from the user cache.
+    Routes that change the user load the real row with User.query.get().
+    """
+
+    def __init__(self, user):
+        self.id = user.id
+        self.username = user.username
+        self.preferences = user.preferences
+
+# Snapshots in user_cache are keyed by user id and tagged with the row's version when they
+# were built. load_user() reads only the version column (a primary-key lookup) and reuses
+# the snapshot while it matches, so a change made through any session, on any worker, is
+# seen on the user's next request everywhere.
+
+def invalidate_user(user_id):
+    """
+    Drop this worker's snapshot for `user_id` after changing the user's row, so the next
+    request does not have to discover the new version first.
+    """
+    user_cache.delete(user_id)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    version = db.session.query(User.version).filter(User.id == user_id).scalar()
+    if version is None:
+        return None
+    entry = user_cache.get(user_id)
+    if entry is not None:
+        snapshot, entry_version = entry
+        if entry_version == version:
+            metrics.registry.inc('cache_lookups_total', cache='user', outcome='hit')
+            return snapshot
+
+    metrics.registry.inc('cache_lookups_total', cache='user', outcome='miss')
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    snapshot = CachedUser(user)
+    user_cache.set(user_id, (snapshot, user.version))
+    return snapshot
 
 # ---------------------------
 # Helper Functions
 # ---------------------------
 
 def compare_queries(query1, query2):
-    return SequenceMatcher(None, query1, query2).ratio()
+    """
+    Similarity of two queries using the configured SIMILARITY_METHOD.
+    Values below SIMILARITY_THRESHOLD may be reported as any value below it.
+    """
+    return similarity(
+        query1, query2, current_app.config['SIMILARITY_METHOD'], threshold=current_app.config['SIMILARITY_THRESHOLD']
+    )
 
-def get_user_preferences(user):
+# Reference point for decayed term weights; weights grow from here instead of shrinking over time,
+# so stored values never need rewriting and ordering by weight stays correct. Growth is exponential,
+# so weights are kept as their log2, which grows linearly and cannot overflow.
+TERM_WEIGHT_EPOCH = datetime(2024, 1, 1)
+
+def term_weight(when):
+    """
+    log2 of the weight added for one occurrence of a term searched at `when`.
+    """
+    half_life = current_app.config['TERM_DECAY_HALF_LIFE_DAYS']
+    if not half_life:
+        return 0.0
+    age_days = (when - TERM_WEIGHT_EPOCH).total_seconds() / 86400
+    return age_days / half_life
+
+def log2_add(a, b):
+    """
+    log2(2**a + 2**b), computed without leaving log space. Registered as an SQL function.
+    """
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1.0 + 2.0 ** (low - high))
+
+def register_sql_functions(dbapi_connection, connection_record):
+    dbapi_connection.create_function('log2_add', 2, log2_add, deterministic=True)
+    dbapi_connection.create_function('normalize_query', 1, normalize_query, deterministic=True)
+
+def record_search_terms(user_id, query, when=None):
+    """
+    Add the words of `query` to the user's term table. Runs in the caller's transaction.
+    """
+    when = when or datetime.utcnow()
+    weight = term_weight(when)
+    for term in set(query.lower().split()):
+        stmt = sqlite_insert(UserTerm).values(
+            user_id=user_id, term=term[:100], count=1, weight=weight, last_seen=when
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'term'],
+            set_={
+                'count': UserTerm.count + 1,
+                'weight': func.log2_add(UserTerm.weight, weight),
+                'last_seen': when,
+            },
+        )
+        db.session.execute(stmt)
+
+def backfill_user_terms(user):
+    """
+    Rebuild the term table for a user from their full search history.
+    Used for searches recorded before the table existed; safe to re-run.
+    """
+    UserTerm.query.filter_by(user_id=user.id).delete()
+    for search in user.searches.yield_per(500):
+        record_search_terms(user.id, search.search_query, search.timestamp or datetime.utcnow())
+    db.session.commit()
+
+@metrics.timed('preferences')
+def get_user_preferences(user, backfill=True):
     """
-    Analyze the user's past searches to infer preferences.
+    Infer the user's preferences from their most frequent search terms.
+    With `backfill`, a user with history but no terms yet has them rebuilt first.
     """
-    search_counts = {}
-    for search in user.searches:
-        query = search.search_query.lower()
-        words = query.split()
-        for word in words:
-            search_counts[word] = search_counts.get(word, 0) + 1
+    def top_terms():
+        return [
+            term for (term,) in db.session.query(UserTerm.term)
+            .filter(UserTerm.user_id == user.id)
+            .order_by(UserTerm.weight.desc(), UserTerm.last_seen.desc())
+            .limit(10)  # Top 10 preferences
+        ]
 
-    sorted_words = sorted(search_counts.items(), key=lambda item: item[1], reverse=True)
-    top_preferences = [word for word, count in sorted_words[:10]]  # Top 10 preferences
+    top_preferences = top_terms()
+    if backfill and not top_preferences and user.searches.first() is not None:
+        backfill_user_terms(user)
+        top_preferences = top_terms()
 
     preferences = ', '.join(top_preferences)
-    logging.debug(f"Inferred Preferences for User {user.username}: {preferences}")
+    logger.debug("Inferred preferences for user %s: %s", user.username, preferences)
     return preferences
 
+@metrics.timed('rewrite')
 def modify_query_with_preferences(query, preferences):
     """
     Modify the original query based on user preferences by applying personalization only when relevant.
     If no preferences are relevant, return the original query.
     """
-    logging.debug(f"Modifying query: '{query}' with preferences: '{preferences}'")
+    logger.debug("Modifying query: '%s' with preferences: '%s'", query, preferences)
 
     try:
         preferences_list = [pref.strip().lower() for pref in preferences.split(',')]
         query_parts = query.lower().split()
 
-        # Contextual map to identify relevant preferences based on query words
-        contextual_map = {
-            "gaming": ["headset", "mouse", "monitor", "controller", "games"],
-            "music": ["headphones", "speakers", "playlist"],
-            "coding": ["keyboard", "programming", "tools", "laptops"],
-            "sports": ["basketball", "football", "shoes"],
-            "english teacher": ["teaching", "curriculum", "lesson", "resources"],
-            # Add more mappings as needed
-        }
-
-        relevant_preferences = []
-        for pref in preferences_list:
-            if pref in contextual_map:
-                for word in query_parts:
-                    if word in contextual_map[pref]:
-                        relevant_preferences.append(pref)
-                        break
+        relevant_preferences = taxonomy.relevant_preferences(preferences_list, query_parts)
 
         if not relevant_preferences:
-            logging.debug("No relevant preferences found. Returning original query.")
+            logger.debug("No relevant preferences found. Returning original query.")
             return query
 
-        system_prompt = (
-            "You are an assistant that personalizes search queries based on user preferences. "
-            "Only apply preferences if they are relevant to the query. If no preferences are relevant, "
-            "return the query unchanged. Do not include any prefixes, labels, or additional text."
-        )
+        cache_key = make_rewrite_key(query, relevant_preferences, OPENAI_MODEL, PROMPT_VERSION)
+        cached_query = rewrite_cache.get(cache_key)
+        if cached_query is not None:
+            logger.debug("Rewrite cache hit for '%s': '%s'", query, cached_query)
+            return cached_query
 
-        examples = (
-            "Examples:\n"
-            "- Preferences: gaming, music\n"
-            "  Original Query: cooking recipes\n"
-            "  Output: cooking recipes\n"
-            "- Preferences: coding, gaming\n"
-            "  Original Query: wireless headphones\n"
-            "  Output: gaming wireless headphones\n"
-            "- Preferences: sports\n"
-            "  Original Query: basketball equipment\n"
-            "  Output: sports basketball equipment\n"
-            "- Preferences: english teacher\n"
-            "  Original Query: teaching resources\n"
-            "  Output: english teacher teaching resources\n"
+        modified_query = rewrite_flight.do(
+            cache_key,
+            lambda: rewrite_engine.rewrite(query, relevant_preferences),
+            recheck=lambda: rewrite_cache.peek(cache_key),
         )
+        rewrite_cache.set(cache_key, modified_query)
+        return modified_query
+    except Exception as e:
+        logger.error("Error modifying query: %s", e, exc_info=True)
+        return query  # Fallback to original query
 
-        messages = [
-            {"role": "system", "content": system_prompt + "\n\n" + examples},
-            {"role": "user", "content": f"Preferences: {', '.join(relevant_preferences)}"},
-            {"role": "user", "content": f"Original Query: {query}"},
-        ]
+def get_openai():
+    """
+    Import and configure the OpenAI SDK on first use; importing it is slow.
+    """
+    import openai
+    openai.api_key = current_app.config['OPENAI_API_KEY']
+    openai.api_base = current_app.config['OPENAI_API_BASE']
+    return openai
 
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
+@metrics.timed('llm')
+def rewrite_with_llm(query, relevant_preferences):
+    """
+    Ask the LLM to personalise `query` for `relevant_preferences`.
+    """
+    system_prompt = (
+        "You are an assistant that personalizes search queries based on user preferences. "
+        "Only apply preferences if they are relevant to the query. If no preferences are relevant, "
+        "return the query unchanged. Do not include any prefixes, labels, or additional text."
+    )
+
+    examples = (
+        "Examples:\n"
+        "- Preferences: gaming, music\n"
+        "  Original Query: cooking recipes\n"
+        "  Output: cooking recipes\n"
+        "- Preferences: coding, gaming\n"
+        "  Original Query: wireless headphones\n"
+        "  Output: gaming wireless headphones\n"
+        "- Preferences: sports\n"
+        "  Original Query: basketball equipment\n"
+        "  Output: sports basketball equipment\n"
+        "- Preferences: english teacher\n"
+        "  Original Query: teaching resources\n"
+        "  Output: english teacher teaching resources\n"
+    )
+
+    messages = [
+        {"role": "system", "content": system_prompt + "\n\n" + examples},
+        {"role": "user", "content": f"Preferences: {', '.join(relevant_preferences)}"},
+        {"role": "user", "content": f"Original Query: {query}"},
+    ]
+
+    try:
+        response = get_openai().ChatCompletion.create(
+            model=OPENAI_MODEL,
             messages=messages,
             temperature=0.2,
             max_tokens=100,
         )
+    except Exception:
+        metrics.registry.inc('upstream_errors_total', upstream='openai')
+        raise
 
-        gpt_modified_query = response['choices'][0]['message']['content'].strip()
+    gpt_modified_query = response['choices'][0]['message']['content'].strip()
 
-        # Remove possible prefixes
-        prefixes_to_remove = ["output:", "modified query:", "result:"]
-        for prefix in prefixes_to_remove:
-            if gpt_modified_query.lower().startswith(prefix):
-                gpt_modified_query = gpt_modified_query[len(prefix):].strip()
+    # Remove possible prefixes
+    prefixes_to_remove = ["output:", "modified query:", "result:"]
+    for prefix in prefixes_to_remove:
+        if gpt_modified_query.lower().startswith(prefix):
+            gpt_modified_query = gpt_modified_query[len(prefix):].strip()
 
-        logging.debug(f"GPT modified query after cleaning: '{gpt_modified_query}'")
+    logger.debug("GPT modified query after cleaning: '%s'", gpt_modified_query)
+    return gpt_modified_query
 
-        similarity = compare_queries(query, gpt_modified_query)
-        if similarity > 0.9 or gpt_modified_query == query:
-            logging.debug("Modified query is very similar to the original. Using original query.")
-            return query
-
-        return gpt_modified_query
-    except Exception as e:
-        logging.error(f"Error modifying query: {e}", exc_info=True)
-        return query  # Fallback to original query
-
-def serpapi_search(query, page):
+def accept_rewrite(query, modified_query):
     """
-    Perform a search using SerpApi's Google Search API.
+    Keep a rewrite only if it is meaningfully different from the original query.
     """
-    params = {
+    if compare_queries(query, modified_query) > current_app.config['SIMILARITY_THRESHOLD'] or modified_query == query:
+        logger.debug("Modified query is very similar to the original. Using original query.")
+        return query
+    return modified_query
+
+# Local tiers answer what they can; the LLM is only asked when they cannot
+REWRITE_TIER_FACTORIES = {
+    'rules': lambda config, services: RuleTier(services.taxonomy),
+    'learned': lambda config, services: LearnedTier(
+        store=SQLiteCache(config['REWRITE_CACHE_PATH'], table='learned_rewrite') if config['REWRITE_CACHE_PATH'] else None,
+        min_support=config['LEARNED_MIN_SUPPORT'],
+        min_confidence=config['LEARNED_MIN_CONFIDENCE'],
+    ),
+    'llm': lambda config, services: LLMTier(rewrite_with_llm),
+}
+
+def build_serpapi_params(query, page, num=10):
+    """
+    Build SerpApi request parameters for `num` results starting at `page`.
+    """
+    return {
         "q": query,
-        "api_key": serpapi_api_key,
         "engine": "google",
         "start": (page - 1) * 10,
-        "num": 10,
+        "num": num,
         "hl": "en",  # Language
         "gl": "us",  # Country
         "google_domain": "google.com"
     }
+
+def result_key(query, page, params):
+    return make_result_key(query, page, params["hl"], params["gl"], params["google_domain"])
+
+def serpapi_search(query, page):
+    """
+    Perform a search using SerpApi's Google Search API.
+    Pages are served from the shared result cache when possible.
+    """
+    results, total, _ = serpapi_search_entry(query, page)
+    return results, total
+
+@metrics.timed('serpapi')
+def serpapi_search_entry(query, page):
+    """
+    Like serpapi_search(), plus the version of the cached page (its stored_at),
+    or None if the search failed.
+    """
+    params = build_serpapi_params(query, page)
+    key = result_key(query, page, params)
+    # A stale hit runs the fetch on the cache's refresh thread, which needs this app's context too
+    fetch = in_app_context(current_app._get_current_object(), lambda: serp_flight.do(
+        key,
+        lambda: fetch_serpapi_page(params),
+        recheck=lambda: result_cache.get_fresh(key),
+    ))
     try:
-        search = google_search.GoogleSearch(params)  # Correct class instantiation
-        results_json = search.get_dict()
-        logging.debug(f"SerpApi response: {results_json}")
+        cached, version = result_cache.get_or_fetch_entry(key, fetch)
+        return cached['results'], cached['total'], version
+    except Exception as e:
+        logger.error("Error during search: %s", e, exc_info=True)
+        return [], 0, None
 
-        results = [
-            {
-                'name': item.get('title', ''),
-                'url': item.get('link', ''),
-                'snippet': item.get('snippet', '')
-            }
-            for item in results_json.get('organic_results', [])
-        ]
+def prefetch_pages(query, first_page, count):
+    """
+    Warm the result cache with `count` pages starting at `first_page`.
+    Several missing pages are fetched with a single upstream call and split.
+    """
+    if count == 1:
+        serpapi_search(query, first_page)
+        return
+
+    params = build_serpapi_params(query, first_page, num=count * 10)
+    pages = range(first_page, first_page + count)
+    if all(result_cache.is_fresh(result_key(query, page, params)) for page in pages):
+        return
+
+    fetched = fetch_serpapi_page(params)
+    for offset, page in enumerate(pages):
+        chunk = fetched['results'][offset * 10:(offset + 1) * 10]
+        if chunk:
+            result_cache.put(result_key(query, page, params), {'results': chunk, 'total': fetched['total']})
+
+@metrics.timed('serpapi_fetch')
+def fetch_serpapi_page(params):
+    """
+    Fetch one page of results from SerpApi. Raises on upstream errors so they are not cached.
+    """
+    results_json = serpapi_client.search(params)
+    logger.debug("SerpApi response: %s", results_json)
+
+    if 'error' in results_json and 'organic_results' not in results_json:
+        raise RuntimeError(f"SerpApi error: {results_json['error']}")
+
+    results = [
+        {
+            'name': item.get('title', ''),
+            'url': item.get('link', ''),
+            'snippet': item.get('snippet', '')
+        }
+        for item in results_json.get('organic_results', [])
+    ]
+
+    # Parse total results
+    total_results = results_json.get('search_information', {}).get('total_results', 0)
+    total = int(total_results) if isinstance(total_results, int) else 0
 
-        # Parse total results
-        total_results = results_json.get('search_information', {}).get('total_results', 0)
-        total = int(total_results) if isinstance(total_results, int) else 0
+    logger.debug("Total results: %d", total)
 
-        logging.debug(f"Total results: {total} (type: {type(total)})")
+    return {'results': results, 'total': total}
 
-        return results, total
+def write_search_batch(rows):
+    """
+    Insert a batch of `(author_id, search_query, timestamp, titles, snippets)` rows,
+    index them for history search and update term counts.
+    """
+    search_ids = db.session.scalars(
+        insert(Search).returning(Search.id, sort_by_parameter_order=True),
+        [{'author_id': author_id, 'search_query': query, 'timestamp': when}
+         for author_id, query, when, _, _ in rows]
+    ).all()
+    index_searches(db.session, [
+        (search_id, author_id, query, titles, snippets)
+        for search_id, (author_id, query, _, titles, snippets) in zip(search_ids, rows)
+    ])
+    try:
+        with db.session.begin_nested():
+            for author_id, query, when, _, _ in rows:
+                record_search_terms(author_id, query, when)
     except Exception as e:
-        logging.error(f"Error during search: {e}", exc_info=True)
-        return [], 0
+        # Term counts only feed preference inference; never lose the searches over them.
+        logger.error("Failed to update term counts for %d searches: %s", len(rows), e, exc_info=True)
+    db.session.commit()
+
+def load_suggest_counts():
+    """
+    Return the highest search id and, over all rows up to it, `(normalized query, distinct authors)`.
+    """
+    last_id = db.session.query(func.max(Search.id)).scalar() or 0
+    query = func.normalize_query(Search.search_query)
+    rows = (
+        db.session.query(query, func.count(Search.author_id.distinct()))
+        .filter(Search.id <= last_id)
+        .group_by(query)
+        .all()
+    )
+    return last_id, rows
+
+def load_searches_since(after_id, limit):
+    """
+    Return up to `limit` `(id, author_id, query)` rows with id above `after_id`, oldest first.
+    """
+    return (
+        db.session.query(Search.id, Search.author_id, Search.search_query)
+        .filter(Search.id > after_id)
+        .order_by(Search.id)
+        .limit(limit)
+        .all()
+    )
+
+def load_user_query_counts(user_id, through_id=None):
+    """
+    Return `(query, count)` over a user's searches, up to search id `through_id` if given.
+    """
+    query = db.session.query(Search.search_query, func.count()).filter(Search.author_id == user_id)
+    if through_id is not None:
+        query = query.filter(Search.id <= through_id)
+    return query.group_by(Search.search_query).all()
+
+@metrics.timed('history_search')
+def search_history_page(user_id, text_query, page):
+    """
+    Return one page of the user's history matching `text_query`, and whether another page follows.
+    """
+    page_size = current_app.config['HISTORY_PAGE_SIZE']
+    hits = search_history_index(db.session, user_id, text_query, limit=page_size + 1,
+                                offset=(page - 1) * page_size)
+    return hits[:page_size], len(hits) > page_size
+
+def parse_history_cursor(raw):
+    """
+    Parse a history cursor of the form '<timestamp>|<id>'. Raises ValueError if malformed.
+    """
+    timestamp_key, _, last_id = raw.rpartition('|')
+    if not timestamp_key or len(timestamp_key) > 32:
+        raise ValueError(f"Invalid history cursor: {raw!r}")
+    return timestamp_key, int(last_id)
+
+def fetch_history_page(user_id, cursor=None, limit=50):
+    """
+    Return one page of a user's history, newest first, and the cursor for the next page.
+
+    Pages are keyset-paginated on (timestamp, id) using ix_search_author_timestamp,
+    so every page costs the same no matter how deep into the history it is.
+    Timestamps are compared in their stored text form, which is how SQLite orders
+    them; parsing and re-binding them would drop rows whose stored precision differs.
+    """
+    history = db.session.query(
+        Search.id,
+        Search.search_query,
+        Search.timestamp,
+        cast(Search.timestamp, String).label('timestamp_key'),
+    ).filter(Search.author_id == user_id)
+
+    if cursor is not None:
+        timestamp_key, last_id = cursor
+        history = history.filter(
+            tuple_(Search.timestamp, Search.id) < tuple_(literal(timestamp_key, String), last_id)
+        )
+
+    rows = history.order_by(Search.timestamp.desc(), Search.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1].timestamp_key}|{rows[-1].id}"
+    return rows, next_cursor
+
+def history_version(user_id):
+    """
+    Changes whenever a search is added to or removed from the user's history.
+    A primary-key read of the counter the search table's triggers maintain.
+    """
+    return db.session.query(User.history_version).filter(User.id == user_id).scalar()
+
+# ---------------------------
+# Conditional GETs
+# ---------------------------
+
+def page_etag(*parts):
+    """
+    ETag for a page rendered from `parts`, or None if the page must not be reused.
+
+    Pages also depend on the templates and, through base.html's nav, on whether
+    the visitor is logged in. A pending flash message is shown only once, so a
+    page carrying one gets no ETag.
+    """
+    if session.get('_flashes'):
+        return None
+    return make_etag(current_app.extensions['template_version'], current_user.is_authenticated, *parts)
+
+def conditional_page(etag, render):
+    """
+    Answer with 304 Not Modified if the client already holds `etag`, else with `render()`.
+    """
+    if etag is None:
+        return render()
+    matched = matching_etag(request, etag)
+    if matched is not None:
+        metrics.registry.inc('http_not_modified_total', endpoint=request.endpoint)
+        response = Response(status=304)
+        response.set_etag(matched)
+    else:
+        response = current_app.make_response(render())
+        response.set_etag(etag)
+    # Per-user pages: browsers may keep them, but must revalidate before reuse.
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def render_results_page(etag, **context):
+    """
+    Render results.html, reusing the HTML already rendered for `etag` in this process.
+    """
+    if etag is None:
+        return render_template('results.html', **context)
+    html = page_cache.get(etag)
+    if html is not None:
+        metrics.registry.inc('cache_lookups_total', cache='page', outcome='hit')
+        return html
+    metrics.registry.inc('cache_lookups_total', cache='page', outcome='miss')
+    html = render_template('results.html', **context)
+    page_cache.set(etag, html)
+    return html
+
+@bp.cli.command('backfill-user-terms')
+def backfill_user_terms_command():
+    """
+    Rebuild every user's term table from the search history.
+    """
+    for user in User.query.all():
+        backfill_user_terms(user)
+    print("User terms rebuilt.")
+
+@bp.cli.command('personalize-batch')
+@click.argument('input_path')
+@click.argument('output_path')
+@click.option('--concurrency', default=8, show_default=True, help='Rewrites to run at once.')
+def personalize_batch_command(input_path, output_path, concurrency):
+    """
+    Personalise a JSONL file of {"user_id", "query"} pairs and write the results as JSONL.
+    """
+    pairs = list(read_pairs(input_path))
+    preferences_by_user = {}
+    for user in User.query.filter(User.id.in_({user_id for user_id, _ in pairs})):
+        # Read-only: nothing is saved, and users whose terms were never built
+        # get none here (run `flask backfill-user-terms` first).
+        preferences_by_user[user.id] = user.preferences or get_user_preferences(user, backfill=False)
+
+    rewrite = in_app_context(current_app._get_current_object(), modify_query_with_preferences)
+    results = personalize_batch(pairs, preferences_by_user, rewrite, concurrency)
+    write_results(output_path, results)
+    changed = sum(1 for result in results if result['personalized_query'] != result['query'])
+    print(f"Wrote {len(results)} results ({changed} personalised) to {output_path}")
+
+def auth_busy(template):
+    """
+    Re-show a login or registration form whose password could not be hashed in time.
+    """
+    flash('Too many sign-in attempts right now. Please try again in a moment.', 'warning')
+    return render_template(template), 503, {'Retry-After': '1'}
+
+def upgrade_password_hash(user, password):
+    """
+    Re-hash a just-verified password whose stored hash uses old parameters.
+    Best effort: the login goes ahead even if hashing is saturated.
+    """
+    try:
+        user.set_password(password)
+    except HasherBusy:
+        logger.info("Deferred password rehash for user %s: hashing is saturated", user.id)
+        return
+    db.session.commit()
+    logger.info("Rehashed password for user %s with %s", user.id, password_hasher.method)
 
 # ---------------------------
 # Routes
 # ---------------------------
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     """
     User registration route.
@@ -261,23 +768,26 @@ def register():
 
         if not username or not password:
             flash('Username and password are required.', 'warning')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
 
         if User.query.filter_by(username=username).first():
             flash('Username already exists!', 'danger')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
 
         new_user = User(username=username)
-        new_user.set_password(password)  # Hash the password
+        try:
+            new_user.set_password(password)  # Hash the password
+        except HasherBusy:
+            return auth_busy('register.html')
         db.session.add(new_user)
         db.session.commit()
 
         flash('Account created! Please log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """
     User login route.
@@ -287,15 +797,27 @@ def login():
         password = request.form['password'].strip()
 
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):  # Check hashed password
+        try:
+            if user is not None:
+                valid = user.check_password(password)  # Check hashed password
+            else:
+                # Same work as a real check, so unknown usernames do not answer faster
+                with metrics.span('password_hash', server_timing=False):
+                    valid = password_hasher.verify_dummy(password)
+        except HasherBusy:
+            return auth_busy('login.html')
+        if valid:
+            if password_hasher.needs_rehash(user.password_hash):
+                upgrade_password_hash(user, password)
             login_user(user)
+            invalidate_user(user.id)
             flash('Logged in successfully!', 'success')
-            return redirect(url_for('search'))
+            return redirect(url_for('main.search'))
 
         flash('Invalid username or password.', 'danger')
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     """
@@ -303,17 +825,18 @@ def logout():
     """
     logout_user()
     flash('Logged out successfully!', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/profile')
+@bp.route('/profile')
 @login_required
 def profile():
     """
     User profile route.
     """
-    return render_template('profile.html', user=current_user)
+    etag = page_etag('profile', current_user.username, current_user.preferences)
+    return conditional_page(etag, lambda: render_template('profile.html', user=current_user))
 
-@app.route('/set_preferences', methods=['GET', 'POST'])
+@bp.route('/set_preferences', methods=['GET', 'POST'])
 @login_required
 def set_preferences():
     """
@@ -321,104 +844,581 @@ def set_preferences():
     """
     if request.method == 'POST':
         preferences = request.form['preferences'].strip()
-        current_user.preferences = preferences
+        user = User.query.get(current_user.id)
+        user.preferences = preferences
         db.session.commit()
+        invalidate_user(user.id)
         flash('Preferences updated!', 'success')
-        return redirect(url_for('profile'))
+        return redirect(url_for('main.profile'))
     return render_template('set_preferences.html', preferences=current_user.preferences or '')
 
-@app.route('/clear_learning')
+@bp.route('/clear_learning')
 @login_required
 def clear_learning():
     """
     Route to clear user search preferences.
     """
-    current_user.preferences = None
+    user = User.query.get(current_user.id)
+    user.preferences = None
     db.session.commit()
+    invalidate_user(user.id)
     flash('Preferences cleared!', 'info')
-    return redirect(url_for('profile'))
+    return redirect(url_for('main.profile'))
 
-@app.route('/search_history')
+@bp.route('/search_history')
 @login_required
 def search_history():
     """
-    Route to display user's search history.
+    Route to display user's search history, one page at a time, or with `q` the
+    past searches matching it, best match first.
+    """
+    text_query = request.args.get('q', '').strip()
+    if text_query:
+        page = min(max(request.args.get('page', 1, type=int), 1), current_app.config['HISTORY_SEARCH_MAX_PAGES'])
+
+        def render_hits():
+            hits, has_next = search_history_page(current_user.id, text_query, page)
+            return render_template(
+                'search_history.html', hits=hits, text_query=text_query, page=page, has_next=has_next
+            )
+
+        etag = page_etag('history', current_user.id, request.query_string, history_version(current_user.id))
+        return conditional_page(etag, render_hits)
+
+    try:
+        cursor = parse_history_cursor(request.args['before']) if request.args.get('before') else None
+    except ValueError:
+        flash('Invalid history page.', 'warning')
+        return redirect(url_for('main.search_history'))
+
+    def render_page():
+        history, next_cursor = fetch_history_page(current_user.id, cursor, current_app.config['HISTORY_PAGE_SIZE'])
+        return render_template(
+            'search_history.html', history=history, next_cursor=next_cursor, is_first_page=cursor is None
+        )
+
+    etag = page_etag('history', current_user.id, request.query_string, history_version(current_user.id))
+    return conditional_page(etag, render_page)
+
+@bp.route('/search_history/export')
+@login_required
+def export_search_history():
+    """
+    Stream the user's full search history as CSV, reading it in keyset batches.
+    """
+    user_id = current_user.id
+    batch_size = current_app.config['HISTORY_EXPORT_BATCH_SIZE']
+
+    def generate():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(['timestamp', 'query'])
+        cursor = None
+        while True:
+            rows, next_cursor = fetch_history_page(user_id, cursor, batch_size)
+            for row in rows:
+                writer.writerow([row.timestamp.isoformat() if row.timestamp else '', row.search_query])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            if next_cursor is None:
+                break
+            cursor = parse_history_cursor(next_cursor)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/csv',
+        headers={'Content-Disposition': 'attachment; filename=search_history.csv'},
+    )
+
+@bp.route('/api/search_history')
+@login_required
+def api_search_history():
+    """
+    JSON variant of the search history. Pass `cursor` from the previous response to page back.
     """
-    history = current_user.searches.order_by(Search.timestamp.desc()).all()
-    return render_template('search_history.html', history=history)
+    limit = min(request.args.get('limit', current_app.config['HISTORY_PAGE_SIZE'], type=int), 500)
+    try:
+        cursor = parse_history_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'error': 'Invalid cursor.'}), 400
+
+    history, next_cursor = fetch_history_page(current_user.id, cursor, max(limit, 1))
+    return jsonify({
+        'items': [
+            {
+                'id': row.id,
+                'query': row.search_query,
+                'timestamp': row.timestamp.isoformat() if row.timestamp else None,
+            }
+            for row in history
+        ],
+        'next_cursor': next_cursor,
+    })
 
-@app.route('/', methods=['GET', 'POST'])
+@bp.route('/api/search_history/search')
+@login_required
+def api_search_history_search():
+    """
+    JSON variant of history search: `q` is the text to find, `page` counts from 1.
+    """
+    text_query = request.args.get('q', '').strip()
+    if not text_query:
+        return jsonify({'error': 'No query provided.'}), 400
+    page = request.args.get('page', 1, type=int)
+    if page < 1 or page > current_app.config['HISTORY_SEARCH_MAX_PAGES']:
+        return jsonify({'error': 'Invalid page.'}), 400
+
+    hits, has_next = search_history_page(current_user.id, text_query, page)
+    return jsonify({
+        'items': [
+            {
+                'id': hit['id'],
+                'query': hit['search_query'],
+                'timestamp': hit['timestamp'].isoformat() if hit['timestamp'] else None,
+                'query_html': str(hit['query_html']),
+                'context_html': str(hit['context_html']),
+            }
+            for hit in hits
+        ],
+        'page': page,
+        'has_next': has_next,
+    })
+
+@bp.route('/', methods=['GET', 'POST'])
 def search():
     """
     Home route displaying the search form.
     """
-    logging.debug("Entered '/' route with method: %s", request.method)
+    logger.debug("Entered '/' route with method: %s", request.method)
     if request.method == 'POST':
         query = request.form.get('query', '').strip()
-        logging.debug("Received POST request with query: '%s'", query)
+        logger.debug("Received POST request with query: '%s'", query)
         if not query:
             flash('Please enter a search query.', 'warning')
-            return redirect(url_for('search'))
+            return redirect(url_for('main.search'))
 
         if current_user.is_authenticated:
             preferences = current_user.preferences
             if not preferences:
                 # Infer preferences from search history if not set
-                preferences = get_user_preferences(current_user)
-                current_user.preferences = preferences
+                user = User.query.get(current_user.id)
+                preferences = get_user_preferences(user)
+                user.preferences = preferences
                 db.session.commit()
-                logging.debug(f"Inferred preferences: {preferences}")
+                invalidate_user(user.id)
+                logger.debug("Inferred preferences: %s", preferences)
 
             if preferences:
-                logging.debug(f"User preferences found: {preferences}")
-                query = modify_query_with_preferences(query, preferences)
-                logging.debug(f"Final query after modification: {query}")
-
-        return redirect(url_for('results', query=query))
-    logging.debug("Rendering 'index.html' for GET request.")
+                logger.debug("User preferences found: %s", preferences)
+                # Personalise and fetch concurrently; the results land in the result
+                # cache, so the redirected /results request is served locally.
+                app = current_app._get_current_object()
+                query, _, _ = asyncio.run(run_search_pipeline(
+                    query,
+                    preferences,
+                    1,
+                    rewrite=in_app_context(app, modify_query_with_preferences),
+                    search=in_app_context(app, serpapi_search),
+                    rewrite_timeout=current_app.config['PIPELINE_REWRITE_TIMEOUT'],
+                    search_timeout=current_app.config['PIPELINE_SEARCH_TIMEOUT'],
+                    hedge=current_app.config['PIPELINE_HEDGE'],
+                ))
+                logger.debug("Final query after modification: %s", query)
+
+        return redirect(url_for('main.results', query=query))
+    logger.debug("Rendering 'index.html' for GET request.")
     return render_template('index.html')
 
-@app.route('/results')
+@bp.route('/suggest')
+@login_required
+def suggest():
+    """
+    Type-ahead completions for `q` as JSON: the user's own past queries, then popular ones.
+    Signed-in users only, so the popular index cannot be walked anonymously.
+    """
+    text = request.args.get('q', '')
+    if len(text) > current_app.config['SUGGEST_MAX_PREFIX']:
+        return jsonify({'query': text, 'suggestions': []})
+    with metrics.span('suggest'):
+        suggestions = suggester.suggest(text, current_user.id)
+    return jsonify({'query': text, 'suggestions': suggestions})
+
+@bp.route('/results')
 def results():
     """
     Route to display search results.
     """
     query = request.args.get('query', '').strip()
-    logging.debug("Entered '/results' route with query: '%s'", query)
+    logger.debug("Entered '/results' route with query: '%s'", query)
     if not query:
         flash('No query provided.', 'warning')
-        return redirect(url_for('search'))
+        return redirect(url_for('main.search'))
 
     page = request.args.get('page', 1, type=int)
-    results, total = serpapi_search(query, page)
+    results, total, version = serpapi_search_entry(query, page)
+
+    if current_app.config['PREFETCH_ENABLED'] and total > page * 10:
+        user_key = current_user.get_id() if current_user.is_authenticated else request.remote_addr
+        prefetcher.schedule(user_key, query, page + 1)
 
     if current_user.is_authenticated:
-        search_entry = Search(search_query=query, author=current_user)
-        db.session.add(search_entry)
-        db.session.commit()
+        titles, snippets = result_documents(results)
+        if current_app.config['HISTORY_WRITE_BEHIND']:
+            history_writer.record((current_user.id, query, datetime.utcnow(), titles, snippets))
+        else:
+            search_entry = Search(search_query=query, author_id=current_user.id)
+            db.session.add(search_entry)
+            db.session.flush()
+            index_searches(db.session, [(search_entry.id, current_user.id, query, titles, snippets)])
+            record_search_terms(current_user.id, query)
+            db.session.commit()
+
+    # Failed searches are not cached, so their page gets no ETag either
+    etag = page_etag('results', query, page, version) if version is not None else None
+    return conditional_page(etag, lambda: render_results_page(
+        etag, results=results, query=query, page=page, total=total
+    ))
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    """
+    This process's metrics in the Prometheus text format.
+    """
+    if not current_app.config['METRICS_ENABLED']:
+        abort(404)
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
-    return render_template('results.html', results=results, query=query, page=page, total=total)
+@bp.route('/healthz')
+def healthz():
+    """
+    Liveness probe for the container healthcheck; touches no templates, DB or upstreams.
+    """
+    return jsonify(status='ok')
 
 # ---------------------------
 # Error Handlers
 # ---------------------------
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
 
-@app.errorhandler(405)
+@bp.app_errorhandler(405)
 def method_not_allowed(e):
     return render_template('405.html'), 405
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(e):
     db.session.rollback()
     return render_template('500.html'), 500
 
+# ---------------------------
+# Instrumentation
+# ---------------------------
+
+def start_commit_timer(session):
+    session.info['commit_started'] = time.perf_counter()
+
+def end_commit_timer(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None:
+        metrics.record_span('db_commit', time.perf_counter() - started)
+
+def start_render_timer(sender, template, context, **extra):
+    g.render_started = time.perf_counter()
+
+def end_render_timer(sender, template, context, **extra):
+    started = g.pop('render_started', None)
+    if started is not None:
+        metrics.record_span('render', time.perf_counter() - started)
+
+def collect_service_metrics():
+    """
+    Samples read from the services' own counters at scrape time.
+    """
+    samples = []
+
+    def add(name, kind, help_text, value, **labels):
+        samples.append((name, kind, help_text, labels, value))
+
+    result = result_cache.stats()
+    rewrite = rewrite_cache.stats()
+    lookups_help = 'Cache lookups by outcome.'
+    for outcome, key in (('hit', 'hits'), ('stale_hit', 'stale_hits'), ('miss', 'misses')):
+        add('cache_lookups_total', 'counter', lookups_help, result[key], cache='result', outcome=outcome)
+    for outcome, key in (('hit', 'hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses')):
+        add('cache_lookups_total', 'counter', lookups_help, rewrite[key], cache='rewrite', outcome=outcome)
+    ratio_help = 'Fraction of lookups answered from the cache since start.'
+    add('cache_hit_ratio', 'gauge', ratio_help, result['hit_ratio'], cache='result')
+    add('cache_hit_ratio', 'gauge', ratio_help, rewrite['hit_ratio'], cache='rewrite')
+    add('result_cache_stale_on_error_total', 'counter', 'Expired results served because SerpApi failed.',
+        result['stale_on_error'])
+
+    serp = serpapi_client.stats()
+    add('upstream_requests_total', 'counter', 'HTTP requests sent upstream, including retries.',
+        serp['requests'], upstream='serpapi')
+    add('upstream_retries_total', 'counter', 'Upstream requests retried.', serp['retries'], upstream='serpapi')
+    add('upstream_errors_total', 'counter', 'Upstream calls that failed after retries.',
+        serp['errors'], upstream='serpapi')
+    add('upstream_rejected_total', 'counter', 'Calls refused by an open circuit breaker.',
+        serp['rejected'], upstream='serpapi')
+    add('circuit_open', 'gauge', '1 while the circuit breaker is open.', int(serp['circuit'] == 'open'),
+        upstream='serpapi')
+
+    for flight in (serp_flight, rewrite_flight):
+        stats = flight.stats()
+        add('singleflight_calls_total', 'counter', 'Coalesced calls by role.', stats['leaders'],
+            flight=flight.name, role='leader')
+        add('singleflight_calls_total', 'counter', 'Coalesced calls by role.', stats['shared'],
+            flight=flight.name, role='shared')
+
+    for tier, stats in rewrite_engine.stats().items():
+        add('rewrite_tier_calls_total', 'counter', 'Rewrite requests seen by each tier.', stats['calls'], tier=tier)
+        add('rewrite_tier_answered_total', 'counter', 'Rewrite requests answered by each tier.',
+            stats['answered'], tier=tier)
+
+    add('prefetch_scheduled_total', 'counter', 'Result-page prefetches started.', prefetcher.scheduled)
+    add('prefetch_dropped_total', 'counter', 'Result-page prefetches skipped by admission limits.',
+        prefetcher.dropped)
+
+    history = history_writer.stats()
+    add('history_queue_depth', 'gauge', 'Search-history rows waiting to be written.', history['queue_depth'])
+    add('history_rows_written_total', 'counter', 'Search-history rows written.', history['written'])
+    add('history_rows_dropped_total', 'counter', 'Search-history rows dropped on a full queue.',
+        history['dropped'])
+    add('history_rows_failed_total', 'counter', 'Search-history rows whose write failed.', history['failed'])
+
+    suggest = suggester.stats()
+    add('suggest_index_queries', 'gauge', 'Distinct queries in the popular-suggestion index.', suggest['queries'])
+    add('suggest_index_prefixes', 'gauge', 'Prefixes with a precomputed top-k list.', suggest['precomputed_prefixes'])
+    add('suggest_cached_users', 'gauge', 'Per-user suggestion indexes held in memory.', suggest['cached_users'])
+
+    hashing = password_hasher.stats()
+    add('password_hash_pending', 'gauge', 'Password hashes queued or running.', hashing['pending'])
+    add('password_hashes_total', 'counter', 'Password hashes and checks completed.', hashing['completed'])
+    add('password_hash_rejected_total', 'counter', 'Password hashes refused because the queue was full.',
+        hashing['rejected'])
+    add('password_hash_timeouts_total', 'counter', 'Password hashes that exceeded PASSWORD_HASH_TIMEOUT.',
+        hashing['timeouts'])
+    return samples
+
+def init_metrics(app):
+    """
+    Time every request and its DB commits and template renders, and report the
+    spans in a Server-Timing header. Aggregates are served on /metrics.
+    """
+    if not app.config['METRICS_ENABLED']:
+        return
+
+    registry = metrics.registry
+    registry.describe('request_seconds', 'histogram', 'Request latency by endpoint.')
+    registry.describe('requests_total', 'counter', 'Requests by endpoint and status.')
+    registry.describe('cache_lookups_total', 'counter', 'Cache lookups by outcome.')
+    registry.describe('upstream_errors_total', 'counter', 'Upstream calls that failed after retries.')
+
+    @app.before_request
+    def start_request_timing():
+        metrics.start_request()
+
+    @app.after_request
+    def record_request_timing(response):
+        timings = metrics.current_timings()
+        if timings is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        registry.observe('request_seconds', time.perf_counter() - timings.start,
+                         endpoint=endpoint, method=request.method)
+        registry.inc('requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+        if app.config['SERVER_TIMING_ENABLED']:
+            response.headers['Server-Timing'] = timings.server_timing()
+        return response
+
+    @app.teardown_request
+    def end_request_timing(exc):
+        metrics.end_request()
+
+    if not event.contains(db.session, 'before_commit', start_commit_timer):
+        event.listen(db.session, 'before_commit', start_commit_timer)
+        event.listen(db.session, 'after_commit', end_commit_timer)
+    before_render_template.connect(start_render_timer, app)
+    template_rendered.connect(end_render_timer, app)
+    registry.add_collector(collect_service_metrics)
+
+def init_http_cache(app):
+    """
+    Record the template version used in page ETags (see page_etag()), and
+    compress responses in the encoding each client prefers.
+    """
+    app.extensions['template_version'] = template_version(os.path.join(app.root_path, app.template_folder))
+    registry = metrics.registry
+    registry.describe('http_not_modified_total', 'counter', 'Conditional GETs answered with 304 Not Modified.')
+    registry.describe('http_compressed_responses_total', 'counter', 'Responses compressed, by encoding.')
+    registry.describe('http_compression_saved_bytes_total', 'counter', 'Response bytes saved by compression.')
+
+    if not app.config['COMPRESS_ENABLED']:
+        return
+
+    @app.after_request
+    def compress(response):
+        encoding = choose_encoding(request)
+        size = response.content_length
+        if compress_response(
+            response,
+            encoding,
+            min_size=app.config['COMPRESS_MIN_SIZE'],
+            gzip_level=app.config['COMPRESS_GZIP_LEVEL'],
+            brotli_quality=app.config['COMPRESS_BROTLI_QUALITY'],
+        ):
+            registry.inc('http_compressed_responses_total', encoding=encoding)
+            registry.inc('http_compression_saved_bytes_total', size - response.content_length)
+        return response
+
+# ---------------------------
+# Application Factory
+# ---------------------------
+
+def in_app_context(app, fn):
+    """
+    Wrap `fn` to run inside `app`'s context, for work handed to other threads.
+    Spans it records are reported on the request that created the wrapper, if any.
+    """
+    timings = metrics.current_timings()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with app.app_context(), metrics.use_timings(timings):
+            return fn(*args, **kwargs)
+    return wrapper
+
+def init_services(app):
+    """
+    Build the app's clients, caches and background workers from `app.config`.
+    """
+    config = app.config
+    services = Services()
+
+    if not config['SERPAPI_API_KEY']:
+        raise ValueError("SERPAPI_API_KEY not found in environment variables.")
+
+    # Pooled SerpApi client with retries and a circuit breaker
+    services.serpapi_client = SerpApiClient(
+        config['SERPAPI_API_KEY'],
+        base_url=config['SERPAPI_BASE_URL'],
+        connect_timeout=config['SERPAPI_CONNECT_TIMEOUT'],
+        read_timeout=config['SERPAPI_READ_TIMEOUT'],
+        max_retries=config['SERPAPI_MAX_RETRIES'],
+        backoff=config['SERPAPI_BACKOFF'],
+        pool_size=config['SERPAPI_POOL_SIZE'],
+        breaker=CircuitBreaker(config['SERPAPI_BREAKER_THRESHOLD'], config['SERPAPI_BREAKER_RESET']),
+    )
+
+    # Shared SerpApi result cache
+    services.result_cache = ResultCache(
+        SQLiteCache(config['RESULT_CACHE_PATH'], max_entries=config['RESULT_CACHE_MAX_ENTRIES']),
+        ttl=config['RESULT_CACHE_TTL'],
+        stale_ttl=config['RESULT_CACHE_STALE_TTL'],
+    )
+
+    # Personalised query rewrite cache
+    services.rewrite_cache = RewriteCache(
+        max_entries=config['REWRITE_CACHE_MAX_ENTRIES'],
+        ttl=config['REWRITE_CACHE_TTL'],
+        store=SQLiteCache(config['REWRITE_CACHE_PATH'], table='rewrite') if config['REWRITE_CACHE_PATH'] else None,
+    )
+
+    # Contextual taxonomy to identify relevant preferences based on query words
+    services.taxonomy = Taxonomy(config['TAXONOMY_PATH'], reload_interval=config['TAXONOMY_RELOAD_INTERVAL'])
+
+    # Coalesce identical concurrent upstream calls (optionally across workers)
+    services.serp_flight = SingleFlight('serpapi', config['SINGLEFLIGHT_LOCK_DIR'] or None, config['SINGLEFLIGHT_LOCK_TIMEOUT'])
+    services.rewrite_flight = SingleFlight('rewrite', config['SINGLEFLIGHT_LOCK_DIR'] or None, config['SINGLEFLIGHT_LOCK_TIMEOUT'])
+
+    # Warms the next result page after /results is served
+    prefetch_count = config['PREFETCH_PAGES']
+    services.prefetcher = Prefetcher(
+        in_app_context(app, lambda query, page: prefetch_pages(query, page, prefetch_count)),
+        max_workers=config['PREFETCH_WORKERS'],
+        max_pending=config['PREFETCH_MAX_PENDING'],
+        per_user_limit=config['PREFETCH_PER_USER'],
+    )
+
+    services.user_cache = LRUCache(config['USER_CACHE_MAX_ENTRIES'])
+
+    services.rewrite_engine = RewriteEngine(
+        [REWRITE_TIER_FACTORIES[name.strip()](config, services) for name in config['REWRITE_TIERS'].split(',') if name.strip()],
+        accept=accept_rewrite,
+    )
+
+    services.history_writer = HistoryWriter(
+        in_app_context(app, write_search_batch),
+        batch_size=config['HISTORY_BATCH_SIZE'],
+        flush_interval=config['HISTORY_FLUSH_INTERVAL'],
+        max_queue=config['HISTORY_QUEUE_SIZE'],
+    )
+
+    # Type-ahead completions from the search table
+    services.suggester = Suggester(
+        in_app_context(app, load_suggest_counts),
+        in_app_context(app, load_searches_since),
+        in_app_context(app, load_user_query_counts),
+        top_k=config['SUGGEST_LIMIT'],
+        min_count=config['SUGGEST_MIN_COUNT'],
+        refresh_interval=config['SUGGEST_REFRESH_INTERVAL'],
+        max_users=config['SUGGEST_USER_CACHE_ENTRIES'],
+    )
+
+    # Rendered result pages by ETag, so a repeat view of a cached search skips Jinja
+    services.page_cache = LRUCache(config['RESULT_PAGE_CACHE_ENTRIES'])
+
+    # Password hashing off the request threads, with admission control. A login waiting
+    # on a hash still holds its request thread, so at least one is always left for pages.
+    services.password_hasher = PasswordHasher(
+        config['PASSWORD_HASH_METHOD'],
+        salt_length=config['PASSWORD_SALT_LENGTH'],
+        workers=config['PASSWORD_HASH_WORKERS'],
+        max_pending=min(config['PASSWORD_HASH_MAX_PENDING'], max(1, config['WEB_THREADS'] - 1)),
+        timeout=config['PASSWORD_HASH_TIMEOUT'],
+        nice=config['PASSWORD_HASH_NICE'],
+    )
+
+    app.extensions['services'] = services
+    _live_services.add(services)
+
+def create_app(config=Config):
+    """
+    Create the Flask application from a config object (see config.Config).
+
+    The schema is not created here; run `flask db upgrade` before serving.
+    Each app gets its own services (see init_services()).
+    """
+    app = Flask(__name__)
+    app.config.from_object(config)
+    configure_sqlite_engine(app)  # Pool sizing; pragmas are set once the engine exists
+
+    # Configure Logging (JSON lines, written off the request thread; levels from Config)
+    configure_logging(app.config)
+
+    db.init_app(app)
+    with app.app_context():
+        configure_sqlite_connections(db.engine, app.config)  # WAL and pragmas
+        event.listen(db.engine, 'connect', register_sql_functions)
+    login_manager.init_app(app)
+    if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+        # Only the `flask db` commands need Flask-Migrate, and it imports all of Alembic.
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    init_services(app)
+    init_metrics(app)
+    init_http_cache(app)
+    app.register_blueprint(bp)
+    return app
+
 # ---------------------------
 # Run the Application
 # ---------------------------
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server only; production runs gunicorn against wsgi.py.
+    create_app().run(debug=os.environ.get('FLASK_DEBUG', '1') == '1')
@@ -0,0 +1,58 @@
+# batch_rewrite.py
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from result_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Batch query personalisation
+# ---------------------------
+
+def read_pairs(path):
+    """
+    Yield `(user_id, query)` from a JSONL file of {"user_id": ..., "query": ...} objects.
+    Blank and malformed lines are skipped with a warning.
+    """
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+                yield int(item['user_id']), str(item['query'])
+            except (ValueError, KeyError, TypeError) as e:
+                logger.warning("Skipping %s line %d: %s", path, line_number, e)
+
+def write_results(path, results):
+    with open(path, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result) + '\n')
+
+def personalize_batch(pairs, preferences_by_user, rewrite, max_workers=8):
+    """
+    Personalise many `(user_id, query)` pairs.
+
+    Pairs are de-duplicated on the user and normalised query, and rewrites run
+    on at most `max_workers` threads. `preferences_by_user` maps user id to a
+    preference string; `rewrite(query, preferences)` does the personalisation.
+    Returns one result dict per unique pair, in input order.
+    """
+    unique = {}
+    for user_id, query in pairs:
+        unique.setdefault((user_id, normalize_query(query)), (user_id, query))
+    logger.info("Personalising %d unique queries", len(unique))
+
+    def run(pair):
+        user_id, query = pair
+        if user_id not in preferences_by_user:
+            return {'user_id': user_id, 'query': query, 'personalized_query': query, 'error': 'unknown user'}
+        preferences = preferences_by_user[user_id]
+        personalized = rewrite(query, preferences) if preferences else query
+        return {'user_id': user_id, 'query': query, 'personalized_query': personalized}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch-rewrite') as executor:
+        return list(executor.map(run, unique.values()))
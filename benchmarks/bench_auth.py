@@ -0,0 +1,131 @@
+# benchmarks/bench_auth.py
+"""
+Benchmark search latency during a login storm, with password hashing done
+inline on the request threads versus in the bounded pool (password_hashing.py).
+
+For each mode the app is started against the upstream stubs (see load_test.py)
+and `--accounts` users are registered. Then `--searchers` clients request
+already-cached result pages for `--duration` seconds, first alone and then
+while `--attackers` clients post logins as fast as they can, a quarter of
+them with a wrong password. Logins refused by admission control (503) are
+counted separately from completed ones. Attackers retry refused logins at
+once unless --retry-after is given; comparing the two separates the cost of
+hashing from the cost of serving the refusals themselves.
+
+    python -m benchmarks.bench_auth
+    python -m benchmarks.bench_auth --modes pool --attackers 32 --retry-after
+"""
+import argparse
+import random
+import tempfile
+import threading
+import time
+
+import requests
+
+from benchmarks.load_test import QUERY_WORDS, Recorder, start_app
+from benchmarks.stub_upstream import start_in_background
+
+# Config overrides for each mode
+MODES = {
+    'inline': {'PASSWORD_HASH_WORKERS': '0'},
+    'pool': {},
+}
+
+def register_accounts(base_url, count):
+    accounts = []
+    with requests.Session() as session:
+        for number in range(count):
+            credentials = {'username': f"bench-{number}", 'password': f"password-{number}"}
+            session.post(base_url + '/register', data=credentials, allow_redirects=False, timeout=30)
+            accounts.append(credentials)
+    return accounts
+
+def search_loop(base_url, queries, recorder, stop, seed):
+    rng = random.Random(seed)
+    with requests.Session() as session:
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                ok = session.get(base_url + '/results', params={'query': rng.choice(queries)},
+                                 timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            recorder.add('GET /results', time.perf_counter() - start, ok)
+
+def login_loop(base_url, accounts, recorder, stop, seed, retry_after):
+    rng = random.Random(seed)
+    while not stop.is_set():
+        credentials = dict(rng.choice(accounts))
+        if rng.random() < 0.25:
+            credentials['password'] = 'wrong'
+        start = time.perf_counter()
+        try:
+            # A fresh client each time, as a credential-stuffing script would be
+            response = requests.post(base_url + '/login', data=credentials, allow_redirects=False, timeout=30)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, 'error'
+        # 302 is a login, 200 a rejected password, 503 a refusal by admission control
+        recorder.add(f"POST /login {status}", time.perf_counter() - start, status in (200, 302, 503))
+        if retry_after and status == 503:
+            stop.wait(float(response.headers.get('Retry-After', 1)))
+
+def run_phase(base_url, queries, accounts, args, attackers):
+    recorder = Recorder()
+    stop = threading.Event()
+    threads = [threading.Thread(target=search_loop, args=(base_url, queries, recorder, stop, seed))
+               for seed in range(args.searchers)]
+    threads += [threading.Thread(target=login_loop,
+                                 args=(base_url, accounts, recorder, stop, 1000 + seed, args.retry_after))
+                for seed in range(attackers)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return recorder.summary(time.monotonic() - start)
+
+def print_phase(label, routes):
+    for route, row in sorted(routes.items()):
+        print(f"  {label:<14}{route:<22}{row['count']:>7}{row['rps']:>8.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--modes', default='inline,pool', help=f"Comma-separated, from: {', '.join(MODES)}")
+    # gunicorn's fixed thread pool is what admission control protects; werkzeug starts a thread per request
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='gunicorn')
+    parser.add_argument('--searchers', type=int, default=4, help='Clients requesting result pages')
+    parser.add_argument('--attackers', type=int, default=16, help='Clients posting logins')
+    parser.add_argument('--accounts', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=20, help='Distinct result pages, fetched once up front')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per phase')
+    parser.add_argument('--retry-after', action='store_true', help='Attackers wait as told after a 503')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    queries = [' '.join(rng.sample(QUERY_WORDS, 2)) for _ in range(args.queries)]
+    stub, stub_url = start_in_background()
+
+    print(f"{args.searchers} searchers, {args.attackers} login clients"
+          f"{' honouring Retry-After' if args.retry_after else ''}, {args.duration:.0f}s per phase")
+    print(f"\n  {'mode/phase':<14}{'route':<22}{'count':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for mode in (name.strip() for name in args.modes.split(',') if name.strip()):
+        process, base_url = start_app(args.server, stub_url, tempfile.mkdtemp(), extra_env=MODES[mode])
+        try:
+            accounts = register_accounts(base_url, args.accounts)
+            for query in queries:
+                requests.get(base_url + '/results', params={'query': query}, timeout=30)
+            print_phase(f"{mode}/quiet", run_phase(base_url, queries, accounts, args, attackers=0))
+            print_phase(f"{mode}/storm", run_phase(base_url, queries, accounts, args, attackers=args.attackers))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+    stub.shutdown()
+
+if __name__ == '__main__':
+    main()
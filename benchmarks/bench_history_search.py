@@ -0,0 +1,168 @@
+# benchmarks/bench_history_search.py
+"""
+Benchmark full-text history search (history_search.py) on a synthetic history.
+
+Builds a scratch SQLite database with the app's schema, fills it with `--rows`
+searches (one heavy user plus many ordinary ones) and their result text, then
+times ranked FTS5 lookups for common, rare, prefix and multi-word queries
+against the LIKE scan over a user's queries that it replaces.
+
+    python -m benchmarks.bench_history_search
+    python -m benchmarks.bench_history_search --rows 100000 --keep /tmp/history.db
+"""
+import argparse
+import itertools
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from app import db
+from history_search import STOPWORDS, index_searches, search_history_index
+from benchmarks.load_test import percentile
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'qu', 'do', 'fe', 'gi', 'ha', 'jo']
+
+def make_vocabulary(size, rng):
+    """
+    Synthetic words, most frequent first. As in English, the stopwords lead.
+    """
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return sorted(STOPWORDS) + words
+
+class TextGenerator:
+    """
+    Zipf-distributed words, so a few are in most rows and most are rare.
+    """
+
+    def __init__(self, vocabulary, rng):
+        self.vocabulary = vocabulary
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def words(self, count):
+        return self.rng.choices(self.vocabulary, cum_weights=self.cum_weights, k=count)
+
+    def sentence(self, low, high):
+        return ' '.join(self.words(self.rng.randint(low, high)))
+
+def build(engine, args, generator):
+    """
+    Create the schema and fill it; return the heavy user's id and the seconds taken.
+    """
+    db.metadata.create_all(engine)
+    users = args.users
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO user (id, username, password_hash) VALUES (:id, :name, '')"),
+                     [{'id': user_id, 'name': f"user{user_id}"} for user_id in range(1, users + 1)])
+
+    search_id = 0
+    remaining = args.rows
+    while remaining:
+        count = min(args.batch, remaining)
+        remaining -= count
+        searches, documents = [], []
+        for _ in range(count):
+            search_id += 1
+            # The heavy user owns --heavy-share of all rows; the rest are spread evenly.
+            author_id = 1 if generator.rng.random() < args.heavy_share else generator.rng.randint(2, users)
+            query = generator.sentence(1, 4)
+            searches.append({'id': search_id, 'author_id': author_id, 'search_query': query,
+                             'timestamp': now - timedelta(seconds=args.rows - search_id)})
+            titles = '\n'.join(generator.sentence(3, 7) for _ in range(args.results))
+            snippets = '\n'.join(generator.sentence(8, 16) for _ in range(args.results))
+            documents.append((search_id, author_id, query, titles, snippets))
+        with engine.begin() as conn:
+            conn.execute(db.metadata.tables['search'].insert(), searches)
+            index_searches(conn, documents)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO search_fts (search_fts) VALUES ('optimize')"))
+    return 1, time.perf_counter() - start
+
+def like_scan(conn, user_id, query, limit):
+    """
+    What a history filter looks like without the index: substring match over one user's queries.
+    """
+    return conn.execute(
+        text("SELECT id, search_query, timestamp FROM search"
+             " WHERE author_id = :user_id AND search_query LIKE :pattern"
+             " ORDER BY timestamp DESC LIMIT :limit"),
+        {'user_id': user_id, 'pattern': f"%{query.rstrip('*')}%", 'limit': limit},
+    ).all()
+
+def time_queries(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return percentile(timings, 0.50) * 1000, percentile(timings, 0.95) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=10_000)
+    parser.add_argument('--heavy-share', type=float, default=0.05, help='Fraction of rows owned by user 1')
+    parser.add_argument('--results', type=int, default=3, help='Result titles/snippets indexed per search')
+    parser.add_argument('--vocabulary', type=int, default=20_000)
+    parser.add_argument('--batch', type=int, default=10_000)
+    parser.add_argument('--queries', type=int, default=200, help='Lookups timed per query kind')
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--keep', help='Build the database at this path and keep it')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    generator = TextGenerator(vocabulary, rng)
+    path = args.keep or os.path.join(tempfile.mkdtemp(), 'history.db')
+    engine = create_engine('sqlite:///' + path)
+
+    print(f"Building {args.rows:,} searches for {args.users:,} users in {path}")
+    heavy_user, seconds = build(engine, args, generator)
+    print(f"Built in {seconds:.1f}s ({args.rows / seconds:,.0f} rows/s), "
+          f"{os.path.getsize(path) / 1e6:,.0f} MB on disk")
+
+    with engine.connect() as conn:
+        typical_user = conn.execute(text(
+            "SELECT author_id FROM search WHERE author_id != :heavy GROUP BY author_id"
+            " ORDER BY count(*) DESC LIMIT 1"), {'heavy': heavy_user}).scalar()
+        history_sizes = dict(conn.execute(text(
+            "SELECT author_id, count(*) FROM search WHERE author_id IN (:a, :b) GROUP BY author_id"),
+            {'a': heavy_user, 'b': typical_user}).all())
+        past_queries = [row[0] for row in conn.execute(text(
+            "SELECT search_query FROM search WHERE author_id = :user_id AND search_query LIKE '% %'"
+            " LIMIT 1000"), {'user_id': heavy_user})]
+
+        kinds = {
+            'common word': lambda: rng.choice(vocabulary[len(STOPWORDS):len(STOPWORDS) + 20]),
+            'rare word': lambda: rng.choice(vocabulary[len(vocabulary) // 2:]),
+            'prefix': lambda: rng.choice(vocabulary[len(STOPWORDS):2000])[:3] + '*',
+            'multi-word': lambda: ' '.join(rng.choice(past_queries).split()[:2]),
+        }
+
+        print(f"\n{'user (history rows)':<26}{'query kind':<14}{'FTS p50':>10}{'FTS p95':>10}"
+              f"{'LIKE p50':>10}{'LIKE p95':>10}  (ms)")
+        for user_id in (heavy_user, typical_user):
+            label = f"user {user_id} ({history_sizes[user_id]:,})"
+            for kind, pick in kinds.items():
+                queries = [pick() for _ in range(args.queries)]
+                fts = time_queries(lambda q: search_history_index(conn, user_id, q, limit=args.page_size), queries)
+                like = time_queries(lambda q: like_scan(conn, user_id, q, args.page_size), queries)
+                print(f"{label:<26}{kind:<14}{fts[0]:>10.2f}{fts[1]:>10.2f}{like[0]:>10.2f}{like[1]:>10.2f}")
+
+    print("\nLIKE only looks at query text and is unranked; FTS also covers result titles and snippets.")
+    engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# benchmarks/bench_logging.py
+"""
+Measure /results throughput under the old and new logging setups.
+
+"before" reproduces the original basicConfig: DEBUG level, plain-text file
+handler writing synchronously on the request thread. "after" is
+logging_setup.configure_logging with the default Config levels. Every request
+uses a fresh query so the SerpApi path (and its payload logging) is exercised;
+the upstream is benchmarks/stub_upstream.py with zero latency and a
+realistically sized payload.
+
+    python -m benchmarks.bench_logging --requests 500
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.load_test import stage_app
+from benchmarks.stub_upstream import start_in_background
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--payload-kb', type=int, default=60, help='Approximate SerpApi response size')
+    args = parser.parse_args()
+
+    server, base_url = start_in_background(serp_padding=args.payload_kb * 1024)
+    scratch = tempfile.mkdtemp()
+    os.environ.setdefault('SERPAPI_API_KEY', 'stub')
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    os.environ['SERPAPI_BASE_URL'] = base_url
+    os.environ['RESULT_CACHE_PATH'] = os.path.join(scratch, 'serp_cache.db')
+    os.environ['LOG_FILE'] = os.path.join(scratch, 'after.log')
+    os.environ['PREFETCH_ENABLED'] = 'false'
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(scratch, 'users.db')
+
+    # The staged copy, which has its templates where Flask looks for them
+    sys.path.insert(0, stage_app(scratch))
+    import app
+    from logging_setup import configure_logging
+
+    application = app.create_app()
+    with application.app_context():
+        app.db.create_all()
+    client = application.test_client()
+
+    def run(label):
+        run.count += 1
+        start = time.perf_counter()
+        failed = sum(client.get(f'/results?query={label}+run{run.count}+query+{i}').status_code != 200
+                     for i in range(args.requests))
+        elapsed = time.perf_counter() - start
+        if failed:
+            sys.exit(f"{label}: {failed} of {args.requests} requests failed; timings would be of error pages")
+        print(f"{label:>6}: {args.requests / elapsed:8.1f} req/s  ({elapsed * 1000 / args.requests:.2f} ms/request)")
+    run.count = 0
+
+    # Warm up templates, connections and the stub server
+    for i in range(20):
+        client.get(f'/results?query=warmup+{i}')
+
+    # After: the configuration app.py installed at import
+    run('after')
+
+    # Before: synchronous DEBUG file logging, as the original basicConfig did
+    logging.basicConfig(
+        filename=os.path.join(scratch, 'before.log'),
+        level=logging.DEBUG,
+        format='%(asctime)s %(levelname)s %(name)s %(message)s',
+        force=True,
+    )
+    for name in list(logging.root.manager.loggerDict):
+        logging.getLogger(name).setLevel(logging.NOTSET)
+    run('before')
+
+    # And back, to rule out warm-up effects
+    configure_logging(application.config)
+    run('after')
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
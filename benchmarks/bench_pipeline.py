@@ -0,0 +1,73 @@
+# benchmarks/bench_pipeline.py
+"""
+Compare the serial personalise-then-search path with run_search_pipeline.
+
+Runs entirely offline against benchmarks/stub_upstream.py:
+
+    python -m benchmarks.bench_pipeline --iterations 20 --serp-latency 0.4 --llm-latency 0.8
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+
+from benchmarks.stub_upstream import start_in_background
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--serp-latency', type=float, default=0.4)
+    parser.add_argument('--llm-latency', type=float, default=0.8)
+    parser.add_argument('--rewrite-timeout', type=float, default=1.5)
+    args = parser.parse_args()
+
+    server, base_url = start_in_background(serp_latency=args.serp_latency, llm_latency=args.llm_latency)
+    scratch = tempfile.mkdtemp()
+    os.environ.setdefault('SERPAPI_API_KEY', 'stub')
+    os.environ.setdefault('OPENAI_API_KEY', 'stub')
+    os.environ['SERPAPI_BASE_URL'] = base_url
+    os.environ['OPENAI_API_BASE'] = base_url + '/v1'
+    os.environ['RESULT_CACHE_PATH'] = os.path.join(scratch, 'serp_cache.db')
+    os.environ['REWRITE_CACHE_PATH'] = ''
+
+    import app  # Imported late so it picks up the stub configuration
+    from search_pipeline import run_search_pipeline
+
+    application = app.create_app()
+    application.app_context().push()
+
+    def fresh_query():
+        # Unique per call so neither cache can answer
+        return f"wireless headset {uuid.uuid4().hex[:8]}"
+
+    def serial():
+        query = app.modify_query_with_preferences(fresh_query(), 'gaming')
+        app.serpapi_search(query, 1)
+
+    def pipelined():
+        asyncio.run(run_search_pipeline(
+            fresh_query(), 'gaming', 1,
+            rewrite=app.in_app_context(application, app.modify_query_with_preferences),
+            search=app.in_app_context(application, app.serpapi_search),
+            rewrite_timeout=args.rewrite_timeout,
+        ))
+
+    print(f"SerpApi latency {args.serp_latency:.2f}s, LLM latency {args.llm_latency:.2f}s, "
+          f"rewrite deadline {args.rewrite_timeout:.2f}s")
+    for name, fn in (('serial', serial), ('pipeline', pipelined)):
+        timings = []
+        for _ in range(args.iterations):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        p95 = timings[max(0, int(len(timings) * 0.95) - 1)]
+        print(f"{name:>9}: p50 {statistics.median(timings) * 1000:7.1f} ms   p95 {p95 * 1000:7.1f} ms")
+
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# benchmarks/bench_similarity.py
+"""
+Micro-benchmark the rewrite similarity check on realistic query pairs:
+the original SequenceMatcher(...).ratio() against each similarity.py measure.
+
+    python -m benchmarks.bench_similarity
+"""
+import argparse
+import timeit
+from difflib import SequenceMatcher
+
+from similarity import METHODS
+
+# (original query, rewritten query) pairs shaped like real personalisation output
+PAIRS = [
+    ("wireless headset", "gaming wireless headset"),
+    ("teaching resources", "english teacher teaching resources"),
+    ("basketball equipment", "sports basketball equipment"),
+    ("cooking recipes", "cooking recipes"),
+    ("best mechanical keyboard for programming", "best mechanical keyboard for programming and coding"),
+    ("noise cancelling headphones under 200", "music noise cancelling headphones under 200"),
+    ("cheap gaming mouse", "best budget gaming mouse for fps games 2024"),
+    ("lesson plans for year 9 poetry", "english teacher lesson plans for year 9 poetry unit resources"),
+    ("football boots", "football boots"),
+    ("laptops", "coding laptops for software development with 32gb ram"),
+]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000)
+    parser.add_argument('--threshold', type=float, default=0.9)
+    args = parser.parse_args()
+
+    def baseline():
+        for a, b in PAIRS:
+            SequenceMatcher(None, a, b).ratio()
+
+    def measure(fn):
+        def run():
+            for a, b in PAIRS:
+                fn(a, b, args.threshold)
+        return run
+
+    results = {'SequenceMatcher (before)': timeit.timeit(baseline, number=args.number)}
+    for name, fn in METHODS.items():
+        results[name] = timeit.timeit(measure(fn), number=args.number)
+
+    per_pair = args.number * len(PAIRS)
+    base = results['SequenceMatcher (before)']
+    for name, seconds in results.items():
+        print(f"{name:>26}: {seconds / per_pair * 1e6:6.2f} us/pair  ({base / seconds:4.1f}x)")
+
+    print(f"\nDecisions at threshold {args.threshold}:")
+    for a, b in PAIRS:
+        row = [SequenceMatcher(None, a, b).ratio() > args.threshold]
+        row += [fn(a, b, args.threshold) > args.threshold for fn in METHODS.values()]
+        print(f"  {'/'.join('similar' if r else 'differs' for r in row):<40} {a!r} -> {b!r}")
+
+if __name__ == '__main__':
+    main()
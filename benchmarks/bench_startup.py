@@ -0,0 +1,118 @@
+# benchmarks/bench_startup.py
+"""
+Measure cold-start cost: `python -X importtime` on the app module plus the
+create_app() call, in fresh interpreters. Suitable for CI: --json writes the
+numbers, --baseline fails the run when import time regresses past a
+threshold, and --forbid fails it if a module that should load lazily is
+imported at startup.
+
+    python -m benchmarks.bench_startup --runs 5 --baseline startup.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints create_app() time and the loaded modules as JSON.
+CHILD = """
+import json, sys, time
+import app
+start = time.perf_counter()
+app.create_app()
+print(json.dumps({'create_ms': (time.perf_counter() - start) * 1000, 'modules': sorted(sys.modules)}))
+"""
+
+def parse_importtime(stderr):
+    """
+    Return [(depth, module, self_us, cumulative_us)] from -X importtime output.
+    """
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def run_once(env):
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', CHILD],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    child = json.loads(proc.stdout.strip().splitlines()[-1])
+    app_row = next(row for row in rows if row[0] == 0 and row[1] == 'app')
+    return {
+        'import_ms': app_row[3] / 1000,
+        'create_ms': child['create_ms'],
+        'rows': rows,
+        'modules': child['modules'],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='Heaviest imports to list')
+    parser.add_argument('--json', help='Write the medians to this file')
+    parser.add_argument('--baseline', help='JSON from an earlier --json run to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.25,
+                        help='Allowed fractional slowdown against --baseline')
+    parser.add_argument('--forbid', default='openai,flask_migrate,alembic,flask_caching,requests',
+                        help='Comma-separated modules that must not be loaded at startup')
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        SERPAPI_API_KEY='stub',
+        OPENAI_API_KEY='stub',
+        DATABASE_URL='sqlite:///' + os.path.join(scratch, 'users.db'),
+        RESULT_CACHE_PATH=os.path.join(scratch, 'serp_cache.db'),
+        LOG_FILE=os.path.join(scratch, 'app.log'),
+    )
+    env.pop('FLASK_RUN_FROM_CLI', None)
+
+    runs = [run_once(env) for _ in range(args.runs)]
+    import_ms = statistics.median(run['import_ms'] for run in runs)
+    create_ms = statistics.median(run['create_ms'] for run in runs)
+    print(f"import app   {import_ms:8.1f} ms (median of {args.runs})")
+    print(f"create_app() {create_ms:8.1f} ms")
+    print(f"total        {import_ms + create_ms:8.1f} ms")
+
+    print(f"\nHeaviest imports under app (cumulative, last run):")
+    rows = runs[-1]['rows']
+    direct = [row for row in rows if row[0] == 1]  # Imported directly by app.py
+    for depth, name, self_us, cumulative_us in sorted(direct, key=lambda row: -row[3])[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    failed = False
+    loaded = set(runs[-1]['modules'])
+    for name in filter(None, args.forbid.split(',')):
+        if name in loaded:
+            print(f"FAIL: {name} is imported at startup")
+            failed = True
+
+    results = {'import_ms': round(import_ms, 1), 'create_ms': round(create_ms, 1)}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for key in ('import_ms', 'create_ms'):
+            limit = baseline[key] * (1 + args.max_regression)
+            status = 'ok' if results[key] <= limit else 'FAIL'
+            print(f"{status}: {key} {results[key]:.1f} ms vs baseline {baseline[key]:.1f} ms (limit {limit:.1f})")
+            failed |= status == 'FAIL'
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# benchmarks/bench_suggest.py
+"""
+Benchmark the type-ahead suggestion index (suggest.py): build time, memory
+footprint, and completion latency at `--queries` distinct queries.
+
+Prefixes are taken from queries picked by popularity, so short, busy prefixes
+are exercised as often as users would type them. The memory report covers the
+popular index and per-user indexes, to size SUGGEST_USER_CACHE_ENTRIES against
+the container's memory limit.
+
+    python -m benchmarks.bench_suggest
+    python -m benchmarks.bench_suggest --queries 200000 --user-queries 1000
+"""
+import argparse
+import itertools
+import random
+import sys
+import time
+import tracemalloc
+
+from suggest import PrefixIndex, Suggester
+from benchmarks.load_test import percentile
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'qu', 'do', 'fe', 'gi', 'ha', 'jo',
+             'be', 'cu', 'wi', 'ya']
+
+def make_queries(count, vocabulary_size, rng):
+    """
+    Return `count` distinct queries of 1-4 Zipf-distributed words, and Zipf popularity counts.
+    """
+    vocabulary = set()
+    while len(vocabulary) < vocabulary_size:
+        vocabulary.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4))))
+    vocabulary = list(vocabulary)
+    cum_weights = list(itertools.accumulate(1 / rank for rank in range(1, vocabulary_size + 1)))
+
+    queries = set()
+    while len(queries) < count:
+        queries.add(' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(1, 4))))
+    queries = list(queries)
+    rng.shuffle(queries)
+    # Popularity is Zipf too: a few queries are searched thousands of times, most once.
+    return {query: max(1, int(10000 / rank)) for rank, query in enumerate(queries, 1)}
+
+def sample_prefixes(counts, number, rng):
+    queries = list(counts)
+    picked = rng.choices(queries, weights=[counts[query] for query in queries], k=number // 2)
+    picked += rng.choices(queries, k=number - len(picked))
+    return [query[:rng.randint(1, min(len(query), 12))] for query in picked]
+
+def measure(fn, inputs):
+    timings = []
+    for value in inputs:
+        start = time.perf_counter()
+        fn(value)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return {name: percentile(timings, fraction) * 1e3
+            for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))}
+
+def traced(build):
+    """
+    Return `(result, bytes allocated by build() and still held)`.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+def print_latency(label, stats):
+    print(f"  {label:<34}" + ''.join(f"{stats[name]:>9.3f}" for name in ('p50', 'p95', 'p99', 'max')))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--queries', type=int, default=100_000, help='Distinct queries in the popular index')
+    parser.add_argument('--vocabulary', type=int, default=5000)
+    parser.add_argument('--user-queries', type=int, default=500, help="Distinct queries in one user's history")
+    parser.add_argument('--users', type=int, default=500, help='Per-user indexes held (SUGGEST_USER_CACHE_ENTRIES)')
+    parser.add_argument('--top-k', type=int, default=8)
+    parser.add_argument('--scan-limit', type=int, default=64)
+    parser.add_argument('--lookups', type=int, default=20000)
+    parser.add_argument('--target-p99-ms', type=float, default=5.0)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    counts = make_queries(args.queries, args.vocabulary, rng)
+    string_bytes = sum(sys.getsizeof(query) for query in counts)
+
+    start = time.perf_counter()
+    index, index_bytes = traced(lambda: PrefixIndex(counts, args.top_k, args.scan_limit))
+    build_seconds = time.perf_counter() - start
+
+    user_counts = dict(rng.sample(sorted(counts.items()), args.user_queries))
+    user_index, user_bytes = traced(lambda: PrefixIndex(user_counts, args.top_k, args.scan_limit))
+    # Users' queries are loaded separately, so they do not share the popular index's strings.
+    user_bytes += sum(sys.getsizeof(query) for query in user_counts)
+
+    print(f"Popular index: {len(index):,} queries, {index.precomputed:,} precomputed prefixes, "
+          f"built in {build_seconds:.2f}s")
+    print("\nMemory:")
+    print(f"  query strings                     {string_bytes / 1e6:8.1f} MB")
+    print(f"  index (array, counts, top-k)      {index_bytes / 1e6:8.1f} MB"
+          f"  ({index_bytes / len(index):.0f} B/query)")
+    print(f"  one user index ({args.user_queries} queries)       {user_bytes / 1e6:8.2f} MB")
+    print(f"  {args.users:,} user indexes                 {user_bytes * args.users / 1e6:8.1f} MB")
+    total = string_bytes + index_bytes + user_bytes * args.users
+    print(f"  total per worker                  {total / 1e6:8.1f} MB")
+
+    prefixes = sample_prefixes(counts, args.lookups, rng)
+    print(f"\nLatency over {args.lookups:,} prefixes (ms):{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    print_latency('PrefixIndex.complete', measure(index.complete, prefixes))
+    print_latency('PrefixIndex.complete, 1-2 chars', measure(index.complete, [p[:2] for p in prefixes]))
+
+    suggester = Suggester(
+        lambda: (len(counts), counts.items()),
+        lambda after_id, limit: [],
+        lambda user_id, through_id: user_counts.items(),
+        top_k=args.top_k, scan_limit=args.scan_limit, refresh_interval=3600,
+    )
+    suggester.refresh()
+    suggester._checked_at = time.monotonic()
+    suggester.suggest('a', user_id=1)  # Load the user's index
+    suggest_stats = measure(lambda prefix: suggester.suggest(prefix, user_id=1), prefixes)
+    print_latency('Suggester.suggest (user + popular)', suggest_stats)
+
+    new_queries = list(make_queries(args.lookups // 4, args.vocabulary, random.Random(args.seed + 1)))
+    print_latency('PrefixIndex.add', measure(index.add, new_queries + rng.choices(list(counts), k=len(new_queries))))
+    print_latency('PrefixIndex.complete after adds', measure(index.complete, prefixes))
+
+    verdict = 'meets' if suggest_stats['p99'] < args.target_p99_ms else 'MISSES'
+    print(f"\nSuggester p99 {suggest_stats['p99']:.3f} ms {verdict} the {args.target_p99_ms:g} ms target")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_taxonomy.py
+"""
+Time relevant-preference matching: the original nested loop over
+preferences x query words against the compiled Taxonomy reverse index,
+for a synthetic taxonomy of increasing size.
+
+    python -m benchmarks.bench_taxonomy --categories 10 1000 5000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import timeit
+
+from taxonomy import Taxonomy
+
+def nested_loop(contextual_map, preferences_list, query_parts):
+    # The matching loop modify_query_with_preferences used before the taxonomy was compiled
+    relevant_preferences = []
+    for pref in preferences_list:
+        if pref in contextual_map:
+            for word in query_parts:
+                if word in contextual_map[pref]:
+                    relevant_preferences.append(pref)
+                    break
+    return relevant_preferences
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--categories', type=int, nargs='+', default=[10, 1000, 5000])
+    parser.add_argument('--triggers', type=int, default=20, help='Trigger words per category')
+    parser.add_argument('--preferences', type=int, default=10, help='Preferences per user')
+    parser.add_argument('--number', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = [f"word{i}" for i in range(20000)]
+    for size in args.categories:
+        mapping = {f"category {i}": rng.sample(vocabulary, args.triggers) for i in range(size)}
+        path = os.path.join(tempfile.mkdtemp(), 'taxonomy.json')
+        with open(path, 'w') as f:
+            json.dump(mapping, f)
+        taxonomy = Taxonomy(path, reload_interval=3600)
+
+        preferences = rng.sample(list(mapping), min(args.preferences, size))
+        query = rng.sample(vocabulary, 4) + [rng.choice(mapping[preferences[0]])]
+        assert sorted(nested_loop(mapping, preferences, query)) == sorted(taxonomy.relevant_preferences(preferences, query))
+
+        before = timeit.timeit(lambda: nested_loop(mapping, preferences, query), number=args.number)
+        after = timeit.timeit(lambda: taxonomy.relevant_preferences(preferences, query), number=args.number)
+        print(f"{size:>6} categories: nested loop {before / args.number * 1e6:7.2f} us   "
+              f"compiled {after / args.number * 1e6:7.2f} us")
+
+if __name__ == '__main__':
+    main()
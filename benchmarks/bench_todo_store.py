@@ -0,0 +1,188 @@
+# benchmarks/bench_todo_store.py
+"""
+Benchmark the todo service's task store (flask/task_store.py) at `--tasks` tasks.
+
+Reports the time for a fresh process to open the store and serve its first
+page, both after a clean shutdown and after a crash that left `--wal-writes`
+un-checkpointed writes in the write-ahead log. These are set against replaying
+an append-only log of the same tasks, the other design considered. Also
+reports lookup/add/delete latency at full size, and the throughput and
+consistency of several processes adding and deleting at once.
+
+    python -m benchmarks.bench_todo_store
+    python -m benchmarks.bench_todo_store --tasks 200000 --keep /tmp/todo.db
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.load_test import percentile
+
+TASK_STORE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'flask')
+sys.path.insert(0, TASK_STORE_DIR)
+
+from task_store import SCHEMA, TaskStore  # noqa: E402
+
+# Run in a fresh interpreter, so startup includes the import and the first connection
+OPEN_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+sys.path.insert(0, {store_dir!r})
+from task_store import TaskStore
+store = TaskStore({path!r})
+first_page = store.page(0, 100)
+print(time.perf_counter() - start)
+"""
+
+# Leaves `writes` adds and deletes in the WAL, then dies without checkpointing
+CRASH_SCRIPT = """
+import os, sys
+sys.path.insert(0, {store_dir!r})
+from task_store import TaskStore
+store = TaskStore({path!r})
+conn = store._connect()
+conn.execute("PRAGMA wal_autocheckpoint=0")
+conn.execute("BEGIN")
+for number in range({writes}):
+    store.add("written before the crash %d" % number)
+    store.delete(number * 7 + 1)
+conn.execute("COMMIT")
+os._exit(1)
+"""
+
+def task_text(number):
+    return f"Task {number}: follow up on item {number * 7919 % 100000}"
+
+def build(path, count, batch=100_000):
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(SCHEMA)
+    for start in range(0, count, batch):
+        conn.execute("BEGIN")
+        conn.executemany("INSERT INTO task (text) VALUES (?)",
+                         ((task_text(number),) for number in range(start, min(start + batch, count))))
+        conn.execute("COMMIT")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+
+def open_seconds(path, runs):
+    """
+    Median time for a fresh process to open the store and read its first page.
+    """
+    script = OPEN_SCRIPT.format(store_dir=TASK_STORE_DIR, path=path)
+    timings = sorted(float(subprocess.run([sys.executable, '-c', script], check=True, capture_output=True,
+                                          text=True).stdout) for _ in range(runs))
+    return timings[len(timings) // 2]
+
+def replay_log_seconds(directory, count):
+    """
+    Write the same tasks as an append-only JSON-lines log and time rebuilding the index from it.
+    """
+    path = os.path.join(directory, 'tasks.log')
+    with open(path, 'w') as f:
+        for number in range(count):
+            f.write(json.dumps({'op': 'add', 'id': number + 1, 'text': task_text(number)}) + '\n')
+    start = time.perf_counter()
+    tasks = {}
+    with open(path) as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry['op'] == 'add':
+                tasks[entry['id']] = entry['text']
+            else:
+                tasks.pop(entry['id'], None)
+    return time.perf_counter() - start, os.path.getsize(path)
+
+def time_ops(fn, args):
+    timings = []
+    for arg in args:
+        start = time.perf_counter()
+        fn(arg)
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return percentile(timings, 0.50) * 1e3, percentile(timings, 0.99) * 1e3
+
+def churn(path, operations, seed):
+    """
+    One worker process: add tasks and delete its own; return (added, deleted).
+    """
+    store = TaskStore(path)
+    rng = random.Random(seed)
+    mine, added, deleted = [], 0, 0
+    for _ in range(operations):
+        if mine and rng.random() < 0.5:
+            deleted += store.delete(mine.pop(rng.randrange(len(mine))))
+        else:
+            mine.append(store.add(f"worker {seed} task"))
+            added += 1
+    return added, deleted
+
+def count_tasks(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT count(*) FROM task").fetchone()[0]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tasks', type=int, default=1_000_000)
+    parser.add_argument('--wal-writes', type=int, default=50_000, help='Adds and deletes lost in the simulated crash')
+    parser.add_argument('--runs', type=int, default=5, help='Fresh processes timed per startup measurement')
+    parser.add_argument('--ops', type=int, default=10_000, help='Operations timed per kind')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--worker-ops', type=int, default=2_000)
+    parser.add_argument('--keep', help='Build the database at this path and keep it')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    path = args.keep or os.path.join(directory, 'todo.db')
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    build(path, args.tasks)
+    print(f"Built {args.tasks:,} tasks in {time.perf_counter() - start:.1f}s, "
+          f"{os.path.getsize(path) / 1e6:,.0f} MB on disk")
+
+    print("\nStartup to first page, fresh process (median):")
+    print(f"  SQLite, clean shutdown            {open_seconds(path, args.runs) * 1e3:9.1f} ms")
+    crash = CRASH_SCRIPT.format(store_dir=TASK_STORE_DIR, path=path, writes=args.wal_writes)
+    subprocess.run([sys.executable, '-c', crash], capture_output=True)
+    wal_size = os.path.getsize(path + '-wal') if os.path.exists(path + '-wal') else 0
+    # Only the first open after the crash replays the WAL, so time that one on its own.
+    crash_seconds = open_seconds(path, 1)
+    print(f"  SQLite, after crash ({wal_size / 1e6:,.0f} MB WAL)   {crash_seconds * 1e3:9.1f} ms")
+    replay_seconds, log_size = replay_log_seconds(directory, args.tasks)
+    print(f"  append-only log replay ({log_size / 1e6:,.0f} MB)  {replay_seconds * 1e3:9.1f} ms")
+
+    store = TaskStore(path)
+    last_id = store._connect().execute("SELECT max(id) FROM task").fetchone()[0]
+    ids = [rng.randint(1, last_id) for _ in range(args.ops)]
+    print(f"\nOperations at {count_tasks(path):,} tasks (ms):{'p50':>9}{'p99':>9}")
+    for label, fn, inputs in (
+        ('get by id', store.get, ids),
+        ('page of 100', lambda after: store.page(after, 100), ids),
+        ('add', store.add, ['new task'] * args.ops),
+        ('delete by id', store.delete, ids),
+    ):
+        p50, p99 = time_ops(fn, inputs)
+        print(f"  {label:<32}{p50:>9.3f}{p99:>9.3f}")
+
+    before = count_tasks(path)
+    start = time.perf_counter()
+    with multiprocessing.get_context('spawn').Pool(args.workers) as pool:
+        results = pool.starmap(churn, [(path, args.worker_ops, seed) for seed in range(args.workers)])
+    seconds = time.perf_counter() - start
+    added, deleted = sum(r[0] for r in results), sum(r[1] for r in results)
+    after = count_tasks(path)
+    consistent = 'consistent' if after == before + added - deleted else 'INCONSISTENT'
+    print(f"\n{args.workers} processes, {args.workers * args.worker_ops:,} adds/deletes in {seconds:.2f}s "
+          f"({args.workers * args.worker_ops / seconds:,.0f} ops/s); task count {consistent}")
+
+if __name__ == '__main__':
+    main()
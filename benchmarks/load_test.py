@@ -0,0 +1,363 @@
+# benchmarks/load_test.py
+"""
+Load-test the search flow against local SerpApi/OpenAI stubs.
+
+Each virtual user runs the scripted scenario register -> login -> set
+preferences -> search (POST /) -> results -> paginate -> history, in a loop,
+for the requested duration. Latency percentiles and throughput are reported
+per route, and a run can be saved and later compared against:
+
+    python -m benchmarks.load_test --users 20 --duration 30 --save baseline.json
+    python -m benchmarks.load_test --users 20 --duration 30 --baseline baseline.json
+
+By default the app is started in a subprocess (werkzeug, or gunicorn with
+--server gunicorn) on a scratch database; pass --url to test a server that
+is already running and already pointed at the stubs. Any failed request
+fails the run, with or without a baseline.
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import requests
+
+from benchmarks.stub_upstream import start_in_background
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Queries mix taxonomy trigger words (rewritten by the rules tier) with words
+# only the LLM tier can handle, so both rewrite paths carry load.
+QUERY_WORDS = ['wireless', 'headset', 'mouse', 'monitor', 'guitar', 'python', 'laptop', 'tutorial',
+               'shoes', 'running', 'cheap', 'best', 'review', 'keyboard', 'speaker', 'grammar']
+
+# Routes checked against the baseline unless --check says otherwise
+DEFAULT_CHECKS = 'POST /,GET /results'
+
+# Settings that shape the load; a baseline recorded with different values is not comparable
+LOAD_SETTINGS = ('users', 'duration', 'pages', 'preferences', 'server', 'serp_latency', 'llm_latency',
+                 'serp_error_rate', 'llm_error_rate', 'jitter', 'seed')
+
+# ---------------------------
+# Statistics
+# ---------------------------
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an already sorted list.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class Recorder:
+    """
+    Thread-safe collection of (route, seconds, ok) samples.
+    """
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def add(self, route, seconds, ok):
+        with self._lock:
+            self.samples[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+    def summary(self, elapsed):
+        """
+        Return {route: {count, errors, rps, p50_ms, p95_ms, p99_ms}}.
+        """
+        report = {}
+        for route, values in sorted(self.samples.items()):
+            values = sorted(values)
+            report[route] = {
+                'count': len(values),
+                'errors': self.errors[route],
+                'rps': round(len(values) / elapsed, 2),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+            }
+        return report
+
+# ---------------------------
+# Scenario
+# ---------------------------
+
+class VirtualUser:
+    """
+    One browser session working through the scenario.
+    """
+
+    def __init__(self, base_url, recorder, rng, pages):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.rng = rng
+        self.pages = pages
+        self.session = requests.Session()
+        self.username = f"load-{uuid.uuid4().hex[:12]}"
+
+    def request(self, route, method, path, expect=(200, 302), **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, allow_redirects=False,
+                                            timeout=30, **kwargs)
+            ok = response.status_code in expect
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.add(route, time.perf_counter() - start, ok)
+        return response
+
+    def request_when_ready(self, route, method, path, attempts=20, **kwargs):
+        """
+        Like request(), but retry after a 503 as a browser user would, waiting as
+        Retry-After says. Refusals are recorded under their own route.
+        """
+        for _ in range(attempts - 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, self.base_url + path, allow_redirects=False,
+                                                timeout=30, **kwargs)
+            except requests.RequestException:
+                break
+            if response.status_code != 503:
+                self.recorder.add(route, time.perf_counter() - start, response.status_code in (200, 302))
+                return response
+            self.recorder.add(f"{route} 503", time.perf_counter() - start, True)
+            time.sleep(float(response.headers.get('Retry-After', 1)))
+        return self.request(route, method, path, **kwargs)
+
+    def sign_up(self, preferences):
+        credentials = {'username': self.username, 'password': 'load-test-password'}
+        # Signing up is password hashing, which refuses bursts (see password_hashing.py)
+        self.request_when_ready('POST /register', 'POST', '/register', data=credentials)
+        self.request_when_ready('POST /login', 'POST', '/login', data=credentials)
+        self.request('POST /set_preferences', 'POST', '/set_preferences', data={'preferences': preferences})
+
+    def search(self):
+        query = ' '.join(self.rng.sample(QUERY_WORDS, 2))
+        response = self.request('POST /', 'POST', '/', data={'query': query})
+        if response is None or response.status_code != 302:
+            return
+        # /results is timed separately so the POST / number is the pipeline alone.
+        location = response.headers['Location']
+        self.request('GET /results', 'GET', location)
+        for page in range(2, self.pages + 1):
+            self.request('GET /results?page=N', 'GET', f"{location}&page={page}")
+        self.request('GET /search_history', 'GET', '/search_history')
+
+def run_user(base_url, recorder, deadline, seed, pages, preferences):
+    user = VirtualUser(base_url, recorder, random.Random(seed), pages)
+    user.sign_up(preferences)
+    while time.monotonic() < deadline:
+        user.search()
+
+# ---------------------------
+# Target server
+# ---------------------------
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def stage_app(scratch):
+    """
+    Copy the app into `scratch` laid out as the Dockerfile lays it out, and return its directory.
+
+    The checkout keeps templates and assets at the top level; Flask only finds
+    them under templates/ and static/, so the app cannot render pages from there.
+    """
+    target = os.path.join(scratch, 'app')
+    shutil.copytree(ROOT, target, ignore=shutil.ignore_patterns(
+        '.git', '__pycache__', 'instance', 'flask', '*.db', '*.log', '*.docx'))
+    for name in ('templates', 'static/css', 'static/js'):
+        os.makedirs(os.path.join(target, name), exist_ok=True)
+    for name in os.listdir(target):
+        if name.endswith('.html'):
+            shutil.move(os.path.join(target, name), os.path.join(target, 'templates', name))
+    shutil.copy(os.path.join(target, 'style.css'), os.path.join(target, 'static', 'css', 'style.css'))
+    shutil.copy(os.path.join(target, 'scripts.js'), os.path.join(target, 'static', 'js', 'scripts.js'))
+    return target
+
+def start_app(server, stub_url, scratch, extra_env=None):
+    """
+    Start the app on a scratch database in a subprocess; return (process, base_url).
+    `extra_env` overrides config settings, e.g. {'PASSWORD_HASH_WORKERS': '0'}.
+    """
+    port = free_port()
+    env = dict(
+        os.environ,
+        SECRET_KEY='load-test',
+        SERPAPI_API_KEY='stub',
+        OPENAI_API_KEY='stub',
+        SERPAPI_BASE_URL=stub_url,
+        OPENAI_API_BASE=stub_url + '/v1',
+        DATABASE_URL='sqlite:///' + os.path.join(scratch, 'users.db'),
+        RESULT_CACHE_PATH=os.path.join(scratch, 'serp_cache.db'),
+        LOG_FILE=os.path.join(scratch, 'app.log'),
+        WEB_BIND=f"127.0.0.1:{port}",
+        WEB_ACCESS_LOG='',
+    )
+    env.update(extra_env or {})
+    app_dir = stage_app(scratch)
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'app:create_app', 'db', 'upgrade'],
+        cwd=app_dir, env=env, check=True, capture_output=True,
+    )
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:application']
+    else:
+        command = [sys.executable, '-c',
+                   f"from app import create_app; create_app().run('127.0.0.1', {port}, threaded=True)"]
+    process = subprocess.Popen(command, cwd=app_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=open(os.path.join(scratch, 'server.err'), 'w'))
+
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            requests.get(base_url + '/healthz', timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            if process.poll() is not None:
+                break
+            time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError(f"App did not start; see {os.path.join(scratch, 'server.err')}")
+
+# ---------------------------
+# Reporting
+# ---------------------------
+
+def print_report(report, elapsed):
+    print(f"\n{'route':<26}{'count':>7}{'errors':>8}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for route, row in report['routes'].items():
+        print(f"{route:<26}{row['count']:>7}{row['errors']:>8}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+    total = sum(row['count'] for row in report['routes'].values())
+    print(f"\n{total} requests in {elapsed:.1f}s, {total / elapsed:.1f} req/s overall")
+
+def failed_routes(report):
+    """
+    Routes with any failed request; timings of error pages say nothing about the app.
+    """
+    return [route for route, row in report['routes'].items() if row['errors']]
+
+def compare(report, baseline, routes, tolerance):
+    """
+    Print each checked route against the baseline; return True if any regressed.
+    """
+    regressed = False
+    print(f"\nAgainst baseline (tolerance {tolerance:.0%}):")
+    for route in routes:
+        current, previous = report['routes'].get(route), baseline['routes'].get(route)
+        if current is None or previous is None:
+            print(f"  {route:<24} missing from {'this run' if current is None else 'baseline'}")
+            continue
+        problems = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if current[key] > previous[key] * (1 + tolerance):
+                problems.append(f"{key} {previous[key]:.1f} -> {current[key]:.1f}")
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            problems.append(f"rps {previous['rps']:.1f} -> {current['rps']:.1f}")
+        error_rate = current['errors'] / current['count']
+        if error_rate > previous['errors'] / previous['count'] + 0.01:
+            problems.append(f"error rate {error_rate:.1%}")
+        regressed |= bool(problems)
+        print(f"  {route:<24} {'REGRESSED: ' + '; '.join(problems) if problems else 'ok'}")
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=10, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run')
+    parser.add_argument('--pages', type=int, default=3, help='Result pages viewed per search')
+    parser.add_argument('--preferences', default='gaming, music, coding')
+    parser.add_argument('--url', help='Test this running server instead of starting one')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--serp-latency', type=float, default=0.3)
+    parser.add_argument('--llm-latency', type=float, default=0.6)
+    parser.add_argument('--serp-error-rate', type=float, default=0.0)
+    parser.add_argument('--llm-error-rate', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.2, help='Upstream latency variation, as a fraction')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save', help='Write this run to a JSON file')
+    parser.add_argument('--baseline', help='JSON from an earlier --save to compare against')
+    parser.add_argument('--check', default=DEFAULT_CHECKS, help='Comma-separated routes compared to the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed fractional regression')
+    args = parser.parse_args()
+
+    process = None
+    if args.url:
+        base_url = args.url.rstrip('/')
+    else:
+        stub, stub_url = start_in_background(
+            serp_latency=args.serp_latency, llm_latency=args.llm_latency,
+            serp_error_rate=args.serp_error_rate, llm_error_rate=args.llm_error_rate, jitter=args.jitter,
+        )
+        process, base_url = start_app(args.server, stub_url, tempfile.mkdtemp())
+
+    recorder = Recorder()
+    seeds = itertools.count(args.seed)
+    try:
+        print(f"{args.users} users for {args.duration:.0f}s against {base_url}")
+        start = time.monotonic()
+        deadline = start + args.duration
+        threads = [
+            threading.Thread(target=run_user,
+                             args=(base_url, recorder, deadline, next(seeds), args.pages, args.preferences))
+            for _ in range(args.users)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - start
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        'settings': {key: getattr(args, key) for key in LOAD_SETTINGS},
+        'routes': recorder.summary(elapsed),
+    }
+    print_report(report, elapsed)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved to {args.save}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('settings') != report['settings']:
+            print("Warning: baseline was recorded with different settings")
+        routes = [route.strip() for route in args.check.split(',') if route.strip()]
+        regressed = compare(report, baseline, routes, args.tolerance)
+    else:
+        regressed = False
+
+    failed = failed_routes(report)
+    if failed:
+        print(f"\nFAILED: requests to {', '.join(failed)} returned errors")
+    sys.exit(1 if failed or regressed else 0)
+
+if __name__ == '__main__':
+    main()
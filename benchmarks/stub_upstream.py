@@ -0,0 +1,153 @@
+# benchmarks/stub_upstream.py
+"""
+Local stand-ins for SerpApi and the OpenAI chat completions API.
+
+Both endpoints answer from one ThreadingHTTPServer with a configurable
+artificial latency and error rate, so the search flow can be benchmarked offline:
+
+    python -m benchmarks.stub_upstream --port 8765 --serp-latency 0.4 --llm-latency 0.8
+
+then point the app at it with SERPAPI_BASE_URL=http://127.0.0.1:8765 and
+OPENAI_API_BASE=http://127.0.0.1:8765/v1.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Serves GET /search (SerpApi) and POST /v1/chat/completions (OpenAI).
+    """
+
+    # Overridden per server by make_server()
+    serp_latency = 0.0
+    llm_latency = 0.0
+    serp_padding = 0  # Extra bytes per SerpApi response; real payloads run to tens of KB
+    serp_error_rate = 0.0  # Fraction of SerpApi calls answered with a 503
+    llm_error_rate = 0.0  # Fraction of chat completions answered with a 500
+    jitter = 0.0  # Latencies vary uniformly by up to this fraction either way
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path not in ('/search', '/search.json'):
+            return self._send(404, {'error': 'Not found'})
+
+        self._sleep(self.serp_latency)
+        if random.random() < self.serp_error_rate:
+            return self._send(503, {'error': 'Stub upstream failure'})
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        query = params.get('q', '')
+        start = int(params.get('start', 0))
+        num = int(params.get('num', 10))
+        organic = [
+            {
+                'position': start + i + 1,
+                'title': f"{query} result {start + i + 1}",
+                'link': f"https://example.com/{start + i + 1}",
+                'snippet': f"Snippet {start + i + 1} for {query}.",
+            }
+            for i in range(num)
+        ]
+        payload = {
+            'search_information': {'total_results': 1000},
+            'organic_results': organic,
+        }
+        if self.serp_padding:
+            payload['related_questions'] = [{'question': 'x' * 100}] * (self.serp_padding // 120)
+        self._send(200, payload)
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/v1/chat/completions':
+            return self._send(404, {'error': 'Not found'})
+
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        self._sleep(self.llm_latency)
+        if random.random() < self.llm_error_rate:
+            return self._send(500, {'error': {'message': 'Stub upstream failure', 'type': 'server_error'}})
+
+        # Mimic the personalisation prompt: prefix the first relevant preference.
+        preferences, query = '', ''
+        for message in body.get('messages', []):
+            content = message.get('content', '')
+            if content.startswith('Preferences:'):
+                preferences = content[len('Preferences:'):].strip()
+            elif content.startswith('Original Query:'):
+                query = content[len('Original Query:'):].strip()
+        first_pref = preferences.split(',')[0].strip()
+        rewritten = f"{first_pref} {query}".strip()
+
+        self._send(200, {
+            'id': 'chatcmpl-stub',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'stub'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': rewritten},
+                'finish_reason': 'stop',
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0},
+        })
+
+    def _sleep(self, latency):
+        if latency:
+            time.sleep(latency * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+def make_server(host='127.0.0.1', port=0, serp_latency=0.0, llm_latency=0.0, serp_padding=0,
+                serp_error_rate=0.0, llm_error_rate=0.0, jitter=0.0):
+    """
+    Build a stub server; port 0 picks a free port (see server.server_address).
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'serp_latency': serp_latency,
+        'llm_latency': llm_latency,
+        'serp_padding': serp_padding,
+        'serp_error_rate': serp_error_rate,
+        'llm_error_rate': llm_error_rate,
+        'jitter': jitter,
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+def start_in_background(**kwargs):
+    """
+    Start a stub server on a daemon thread and return it together with its base URL.
+    """
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"http://{host}:{port}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--serp-latency', type=float, default=0.4, help='Seconds per SerpApi call')
+    parser.add_argument('--llm-latency', type=float, default=0.8, help='Seconds per chat completion')
+    parser.add_argument('--serp-error-rate', type=float, default=0.0, help='Fraction of SerpApi calls that fail')
+    parser.add_argument('--llm-error-rate', type=float, default=0.0, help='Fraction of chat completions that fail')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Latency variation, as a fraction')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, args.serp_latency, args.llm_latency,
+                         serp_error_rate=args.serp_error_rate, llm_error_rate=args.llm_error_rate,
+                         jitter=args.jitter)
+    print(f"Stub upstream listening on http://{args.host}:{args.port}")
+    server.serve_forever()
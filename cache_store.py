@@ -0,0 +1,177 @@
+# cache_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------------------
+# SQLite-backed key/value store
+# ---------------------------
+
+class SQLiteCache:
+    """
+    A small JSON key/value store kept in a local SQLite file.
+
+    The file is shared by every worker process on the host, so an entry written
+    by one gunicorn worker is visible to all of them. Entries carry the time they
+    were stored; freshness decisions are left to the caller. The store is bounded
+    to `max_entries` and evicts the least recently used rows once it grows past it.
+
+    Counting the rows is a full index scan, so set() keeps a running estimate
+    and only counts when the estimate passes `max_entries` or every
+    COUNT_INTERVAL writes (other processes' writes are not in the estimate).
+    The table can therefore run up to COUNT_INTERVAL rows per process over.
+    Eviction frees up to COUNT_INTERVAL rows below the bound, so a full cache
+    is not recounted on every write.
+    """
+
+    # Only rewrite last_access when it is older than this, so hot keys do not
+    # turn every read into a write.
+    TOUCH_INTERVAL = 30
+
+    # Writes between exact row counts
+    COUNT_INTERVAL = 64
+
+    def __init__(self, path, max_entries=10000, table='cache'):
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._local = threading.local()
+        self._estimate = None  # Rows in the table as of the last count, plus writes since
+        self._writes = 0  # Writes since the last count
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._connect()
+        conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " stored_at REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        conn.execute(
+            f"CREATE INDEX IF NOT EXISTS ix_{table}_last_access ON {table} (last_access)"
+        )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        # A connection inherited across fork() (e.g. gunicorn --preload) must not be
+        # used by the child; open a fresh one and leave the parent's untouched.
+        if conn is None or self._local.pid != os.getpid():
+            # Autocommit mode; each statement is its own short transaction.
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        """
+        Return `(value, stored_at)` for `key`, or None if it is not cached.
+        """
+        conn = self._connect()
+        row = conn.execute(
+            f"SELECT value, stored_at, last_access FROM {self.table} WHERE key = ?",
+            (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, stored_at, last_access = row
+        now = time.time()
+        if now - last_access > self.TOUCH_INTERVAL:
+            conn.execute(
+                f"UPDATE {self.table} SET last_access = ? WHERE key = ?",
+                (now, key)
+            )
+        return json.loads(value), stored_at
+
+    def set(self, key, value):
+        """
+        Store `value` (any JSON-serialisable object) under `key`; return its `stored_at`.
+        """
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, last_access)"
+            " VALUES (?, ?, ?, ?)",
+            (key, json.dumps(value), now, now)
+        )
+        self._evict(conn)
+        return now
+
+    def delete(self, key):
+        self._connect().execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+
+    def clear(self):
+        self._connect().execute(f"DELETE FROM {self.table}")
+
+    def __len__(self):
+        return self._connect().execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    def _evict(self, conn):
+        # Unlocked: a lost update only moves the next count earlier or later.
+        self._writes += 1
+        if self._estimate is not None:
+            self._estimate += 1  # Replacing a key overcounts, which only brings the count forward
+            if self._estimate <= self.max_entries and self._writes < self.COUNT_INTERVAL:
+                return
+
+        count = len(self)
+        if count > self.max_entries:
+            target = self.max_entries - min(self.COUNT_INTERVAL, self.max_entries // 10)
+            conn.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f" SELECT key FROM {self.table} ORDER BY last_access ASC LIMIT ?)",
+                (count - target,)
+            )
+            count = target
+        self._estimate = count
+        self._writes = 0
+
+# ---------------------------
+# In-process LRU
+# ---------------------------
+
+class LRUCache:
+    """
+    A thread-safe, size-bounded in-memory cache with least-recently-used eviction.
+    """
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached value for `key`, or None.
+        """
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
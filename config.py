@@ -5,8 +5,124 @@ from dotenv import load_dotenv
 load_dotenv()  # Load environment variables from .env file
 
 class Config:
-    SECRET_KEY = os.environ.get('SECRET_KEY')
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'your_default_secret_key')  # Replace with a strong secret key
     SERPAPI_API_KEY = os.environ.get('SERPAPI_API_KEY')
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///site.db'  # Update if using a different DB
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///users.db')  # SQLite database
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # SerpApi result cache (shared by all workers on the host)
+    RESULT_CACHE_PATH = os.environ.get('RESULT_CACHE_PATH', 'serp_cache.db')
+    RESULT_CACHE_TTL = int(os.environ.get('RESULT_CACHE_TTL', 3600))  # Seconds a page is fresh
+    RESULT_CACHE_STALE_TTL = int(os.environ.get('RESULT_CACHE_STALE_TTL', 86400))  # Extra seconds served while revalidating
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', 50000))
+
+    # LLM query rewrite cache (memory LRU, plus an optional SQLite tier; empty path disables it)
+    REWRITE_CACHE_MAX_ENTRIES = int(os.environ.get('REWRITE_CACHE_MAX_ENTRIES', 2048))
+    REWRITE_CACHE_TTL = int(os.environ.get('REWRITE_CACHE_TTL', 604800))
+    REWRITE_CACHE_PATH = os.environ.get('REWRITE_CACHE_PATH', RESULT_CACHE_PATH)
+
+    # Upstream endpoints; override to point at benchmarks/stub_upstream.py
+    SERPAPI_BASE_URL = os.environ.get('SERPAPI_BASE_URL', 'https://serpapi.com')
+    OPENAI_API_BASE = os.environ.get('OPENAI_API_BASE', 'https://api.openai.com/v1')
+
+    # Search pipeline deadlines (seconds) and speculative fetch of the unmodified query
+    PIPELINE_REWRITE_TIMEOUT = float(os.environ.get('PIPELINE_REWRITE_TIMEOUT', 1.5))
+    PIPELINE_SEARCH_TIMEOUT = float(os.environ.get('PIPELINE_SEARCH_TIMEOUT', 5.0))
+    PIPELINE_HEDGE = os.environ.get('PIPELINE_HEDGE', 'true').lower() == 'true'
+
+    # Background prefetch of the next result page
+    PREFETCH_ENABLED = os.environ.get('PREFETCH_ENABLED', 'true').lower() == 'true'
+    PREFETCH_PAGES = int(os.environ.get('PREFETCH_PAGES', 1))  # Pages to warm ahead; >1 fetches them in one call
+    PREFETCH_WORKERS = int(os.environ.get('PREFETCH_WORKERS', 2))
+    PREFETCH_MAX_PENDING = int(os.environ.get('PREFETCH_MAX_PENDING', 16))
+    PREFETCH_PER_USER = int(os.environ.get('PREFETCH_PER_USER', 2))
+
+    # Preference inference: half-life (days) for weighting recent search terms; 0 counts every search equally
+    TERM_DECAY_HALF_LIFE_DAYS = float(os.environ.get('TERM_DECAY_HALF_LIFE_DAYS', 0))
+
+    # Write-behind search history; set HISTORY_WRITE_BEHIND=false to commit inline
+    HISTORY_WRITE_BEHIND = os.environ.get('HISTORY_WRITE_BEHIND', 'true').lower() == 'true'
+    HISTORY_BATCH_SIZE = int(os.environ.get('HISTORY_BATCH_SIZE', 100))
+    HISTORY_FLUSH_INTERVAL = float(os.environ.get('HISTORY_FLUSH_INTERVAL', 1.0))  # Seconds
+    HISTORY_QUEUE_SIZE = int(os.environ.get('HISTORY_QUEUE_SIZE', 10000))
+
+    # SQLite connection pool and pragmas (see db_engine.py)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))  # Seconds to wait for a free connection
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', 8192))  # Per connection
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 64 * 1024 * 1024))
+
+    # Search history pagination
+    HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 50))
+    HISTORY_EXPORT_BATCH_SIZE = int(os.environ.get('HISTORY_EXPORT_BATCH_SIZE', 500))
+    # Deepest page of full-text history search; bm25 ranking makes deep offsets costly
+    HISTORY_SEARCH_MAX_PAGES = int(os.environ.get('HISTORY_SEARCH_MAX_PAGES', 20))
+
+    # Type-ahead suggestions (/suggest)
+    SUGGEST_LIMIT = int(os.environ.get('SUGGEST_LIMIT', 8))
+    SUGGEST_MIN_COUNT = int(os.environ.get('SUGGEST_MIN_COUNT', 3))  # Distinct users who must search a query before others see it
+    SUGGEST_REFRESH_INTERVAL = float(os.environ.get('SUGGEST_REFRESH_INTERVAL', 2.0))  # Seconds
+    SUGGEST_USER_CACHE_ENTRIES = int(os.environ.get('SUGGEST_USER_CACHE_ENTRIES', 500))
+    SUGGEST_MAX_PREFIX = int(os.environ.get('SUGGEST_MAX_PREFIX', 100))
+
+    # Response compression (gzip, or brotli when installed) and rendered result pages kept for repeat views
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', 'true').lower() == 'true'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))  # Bytes; smaller bodies are sent as-is
+    COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+    COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 5))
+    RESULT_PAGE_CACHE_ENTRIES = int(os.environ.get('RESULT_PAGE_CACHE_ENTRIES', 1024))
+
+    # Password hashing (see password_hashing.py). Method is Werkzeug's, e.g. "scrypt:32768:8:1" or
+    # "pbkdf2:sha256:600000"; stored hashes made with other parameters are upgraded at the user's next login
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+    PASSWORD_SALT_LENGTH = int(os.environ.get('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))  # Processes per app worker; 0 hashes inline
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 2))  # Beyond this, logins get a 503
+    # Request threads per gunicorn worker (gunicorn.conf.py reads the same variable). Each login
+    # waiting on a hash holds one, so PASSWORD_HASH_MAX_PENDING is capped at WEB_THREADS - 1
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 4))
+    PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5.0))  # Seconds
+    PASSWORD_HASH_NICE = int(os.environ.get('PASSWORD_HASH_NICE', 5))  # Lower priority than page requests
+
+    # Logging (see logging_setup.py); LOG_LEVELS sets per-module levels, e.g. "werkzeug=WARNING,result_cache=DEBUG"
+    LOG_FILE = os.environ.get('LOG_FILE', 'app.log')  # '-' for stderr; a file is rotated externally (logrotate)
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.environ.get('LOG_LEVELS', 'werkzeug=INFO')
+
+    # SerpApi HTTP client (see serpapi_client.py)
+    SERPAPI_CONNECT_TIMEOUT = float(os.environ.get('SERPAPI_CONNECT_TIMEOUT', 3.05))
+    SERPAPI_READ_TIMEOUT = float(os.environ.get('SERPAPI_READ_TIMEOUT', 10.0))
+    SERPAPI_MAX_RETRIES = int(os.environ.get('SERPAPI_MAX_RETRIES', 2))
+    SERPAPI_BACKOFF = float(os.environ.get('SERPAPI_BACKOFF', 0.25))  # Seconds; doubles per retry, jittered
+    SERPAPI_POOL_SIZE = int(os.environ.get('SERPAPI_POOL_SIZE', 10))
+    SERPAPI_BREAKER_THRESHOLD = int(os.environ.get('SERPAPI_BREAKER_THRESHOLD', 5))  # Consecutive failures
+    SERPAPI_BREAKER_RESET = float(os.environ.get('SERPAPI_BREAKER_RESET', 30.0))  # Seconds before a trial call
+
+    # Request coalescing; set SINGLEFLIGHT_LOCK_DIR to also coalesce across worker processes (Unix only)
+    SINGLEFLIGHT_LOCK_DIR = os.environ.get('SINGLEFLIGHT_LOCK_DIR', '')
+    SINGLEFLIGHT_LOCK_TIMEOUT = float(os.environ.get('SINGLEFLIGHT_LOCK_TIMEOUT', 10.0))
+
+    # Query rewrite tiers, tried in order (see rewrite_engine.py)
+    REWRITE_TIERS = os.environ.get('REWRITE_TIERS', 'rules,learned,llm')
+    LEARNED_MIN_SUPPORT = int(os.environ.get('LEARNED_MIN_SUPPORT', 3))
+    LEARNED_MIN_CONFIDENCE = float(os.environ.get('LEARNED_MIN_CONFIDENCE', 0.8))
+
+    # Contextual preference taxonomy (JSON: preference -> trigger words); re-read when the file changes
+    TAXONOMY_PATH = os.environ.get(
+        'TAXONOMY_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'contextual_taxonomy.json')
+    )
+    TAXONOMY_RELOAD_INTERVAL = float(os.environ.get('TAXONOMY_RELOAD_INTERVAL', 2.0))
+
+    # Similarity measure for rejecting near-identical rewrites: sequence, jaccard or levenshtein (see similarity.py)
+    SIMILARITY_METHOD = os.environ.get('SIMILARITY_METHOD', 'sequence')
+    SIMILARITY_THRESHOLD = float(os.environ.get('SIMILARITY_THRESHOLD', 0.9))
+
+    # Authenticated-user cache used by load_user (entries are checked against user.version)
+    USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+
+    # In-process metrics on /metrics, and per-request spans in a Server-Timing header
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', 'true').lower() == 'true'
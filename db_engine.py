@@ -0,0 +1,77 @@
+# db_engine.py
+import os
+import logging
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# SQLite production profile
+# ---------------------------
+
+def is_sqlite_file(uri):
+    return uri.startswith('sqlite:///') and uri != 'sqlite:///:memory:'
+
+def configure_sqlite_engine(app):
+    """
+    Apply pool sizing for a file-backed SQLite database.
+
+    Must be called before SQLAlchemy(app) so the engine is built with these options;
+    the pragmas are set by configure_sqlite_connections() once the engine exists.
+    Has no effect on other database backends.
+    """
+    if not is_sqlite_file(app.config['SQLALCHEMY_DATABASE_URI']):
+        return
+
+    options = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {})
+    options.setdefault('poolclass', QueuePool)
+    options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+    options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+    options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+    connect_args = options.setdefault('connect_args', {})
+    # The pool hands each connection to one thread at a time, so sharing across threads is safe.
+    connect_args.setdefault('check_same_thread', False)
+    connect_args.setdefault('timeout', app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000)
+
+def configure_sqlite_connections(engine, config):
+    """
+    Set the connection pragmas on `engine`'s connections, and keep a forked
+    process from using its parent's connections.
+
+    The listeners are attached to this engine only, so other engines in the
+    process are unaffected and calling this again for the same engine is a no-op.
+    """
+    if not is_sqlite_file(str(engine.url)) or event.contains(engine, 'checkout', discard_forked_connections):
+        return
+
+    pragmas = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': config['SQLITE_BUSY_TIMEOUT_MS'],
+        'cache_size': -config['SQLITE_CACHE_SIZE_KB'],  # Negative means KiB rather than pages
+        'mmap_size': config['SQLITE_MMAP_SIZE'],
+        'temp_store': 'MEMORY',
+    }
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+        connection_record.info['pid'] = os.getpid()
+
+    event.listen(engine, 'connect', set_sqlite_pragmas)
+    event.listen(engine, 'checkout', discard_forked_connections)
+    logger.debug("SQLite engine configured with pragmas %s", pragmas)
+
+def discard_forked_connections(dbapi_connection, connection_record, connection_proxy):
+    # Connections opened before a fork (e.g. by a preloaded app under gunicorn
+    # --preload) belong to the parent; drop them without closing so the pool
+    # opens a new one for this process.
+    pid = connection_record.info.get('pid')
+    if pid is not None and pid != os.getpid():
+        connection_record.dbapi_connection = connection_proxy.dbapi_connection = None
+        raise exc.DisconnectionError(
+            f"Connection record belongs to pid {pid}, attempting to check out in pid {os.getpid()}"
+        )
@@ -1,13 +1,21 @@
+import os
+
 from flask import Flask, jsonify, request, render_template_string
 
+from task_store import TaskStore
+
 app = Flask(__name__)
 
-# A simple in-memory structure to store tasks
-tasks = []
+# Tasks live in SQLite (see task_store.py), so they survive restarts and every worker sees the same list
+tasks = TaskStore(os.environ.get('TODO_DB_PATH', 'todo.db'))
+
+# Tasks shown per page of the list
+PAGE_SIZE = int(os.environ.get('TODO_PAGE_SIZE', 100))
 
 @app.route('/', methods=['GET'])
 def home():
-    # Display existing tasks and a form to add a new task
+    # Display a page of existing tasks and a form to add a new task
+    page = tasks.page(request.args.get('after', 0, type=int), PAGE_SIZE + 1)
     html = '''
 <!DOCTYPE html>
 <html>
@@ -21,29 +29,37 @@ def home():
         <input type="submit" value="Add Task">
     </form>
     <ul>
-        {% for task in tasks %}
-        <li>{{ task }} <a href="/delete/{{ loop.index0 }}">x</a></li>
+        {% for task_id, task in tasks %}
+        <li>{{ task }} <a href="/delete/{{ task_id }}">x</a></li>
         {% endfor %}
     </ul>
+    {% if next_after %}
+    <a href="/?after={{ next_after }}">More</a>
+    {% endif %}
 </body>
 </html>
 '''
-    return render_template_string(html, tasks=tasks)
+    next_after = page[PAGE_SIZE - 1][0] if len(page) > PAGE_SIZE else None
+    return render_template_string(html, tasks=page[:PAGE_SIZE], next_after=next_after)
 
 @app.route('/add', methods=['POST'])
 def add_task():
     # Add a new task from the form data
     task = request.form.get('task')
     if task:
-        tasks.append(task)
+        tasks.add(task)
     return home()
 
-@app.route('/delete/<int:index>', methods=['GET'])
-def delete_task(index):
-    # Delete a task based on its index
-    if index < len(tasks):
-        tasks.pop(index)
+@app.route('/delete/<int:task_id>', methods=['GET'])
+def delete_task(task_id):
+    # Delete a task by its id; deleting one that is already gone is a no-op
+    tasks.delete(task_id)
     return home()
 
+@app.route('/healthz', methods=['GET'])
+def healthz():
+    # Lightweight liveness check for the compose healthcheck
+    return jsonify(status='ok')
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0')
@@ -0,0 +1,82 @@
+# task_store.py
+import os
+import sqlite3
+import threading
+
+# ---------------------------
+# Durable task storage
+# ---------------------------
+
+SCHEMA = (
+    # AUTOINCREMENT never hands out an id twice, so a stale delete link can only
+    # miss; it cannot remove a task added after the one it was rendered for.
+    "CREATE TABLE IF NOT EXISTS task ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " text TEXT NOT NULL)"
+)
+
+class TaskStore:
+    """
+    Tasks in a SQLite database in WAL mode, shared by every worker process.
+
+    Each task has a stable integer id (the table's rowid), so lookup and delete
+    are single primary-key operations whatever the number of tasks. SQLite's
+    file locks serialise writers across processes; WAL lets readers proceed
+    while a write is in progress. Nothing is loaded into memory at startup:
+    opening the database only replays the write-ahead log left by a crash.
+
+    Connections are per thread and are reopened after a fork.
+    """
+
+    def __init__(self, path, busy_timeout=5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        conn = self._connect()
+        conn.execute(SCHEMA)
+
+    def add(self, text):
+        """
+        Store a new task and return its id.
+        """
+        return self._connect().execute("INSERT INTO task (text) VALUES (?)", (text,)).lastrowid
+
+    def get(self, task_id):
+        """
+        Return the task's text, or None if there is no such task.
+        """
+        row = self._connect().execute("SELECT text FROM task WHERE id = ?", (task_id,)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, task_id):
+        """
+        Delete a task; return False if it did not exist (e.g. another worker deleted it first).
+        """
+        return self._connect().execute("DELETE FROM task WHERE id = ?", (task_id,)).rowcount > 0
+
+    def page(self, after_id=0, limit=100):
+        """
+        Return up to `limit` `(id, text)` pairs with ids above `after_id`, oldest first.
+        """
+        return self._connect().execute(
+            "SELECT id, text FROM task WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+        ).fetchall()
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        # Autocommit: every statement is its own transaction.
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        # Commits survive a process crash; a power cut can lose the last few, never corrupt the file.
+        conn.execute("PRAGMA synchronous=NORMAL")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
@@ -0,0 +1,136 @@
+# gunicorn.conf.py
+import os
+import math
+import multiprocessing
+
+# ---------------------------
+# Resource detection
+# ---------------------------
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def detect_cpus():
+    """
+    CPUs available to the container: WEB_CPUS, else the cgroup quota, else the affinity mask.
+    """
+    if os.environ.get('WEB_CPUS'):
+        return float(os.environ['WEB_CPUS'])
+
+    quota = _read('/sys/fs/cgroup/cpu.max')  # cgroup v2: "<quota> <period>" or "max <period>"
+    if quota and not quota.startswith('max'):
+        limit, period = quota.split()
+        return int(limit) / int(period)
+    limit, period = _read('/sys/fs/cgroup/cpu/cpu.cfs_quota_us'), _read('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    if limit and period and int(limit) > 0:
+        return int(limit) / int(period)
+
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return multiprocessing.cpu_count()
+
+def detect_memory_mb():
+    """
+    Memory available to the container in MiB: WEB_MEMORY_MB, else the cgroup limit, else None.
+    """
+    if os.environ.get('WEB_MEMORY_MB'):
+        return int(os.environ['WEB_MEMORY_MB'])
+
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        limit = _read(path)
+        # cgroup v1 reports "unlimited" as a huge number rather than "max".
+        if limit and limit != 'max' and int(limit) < 1 << 50:
+            return int(limit) // (1024 * 1024)
+    return None
+
+# ---------------------------
+# Worker sizing
+# ---------------------------
+
+cpus = detect_cpus()
+memory_mb = detect_memory_mb()
+worker_memory_mb = int(os.environ.get('WEB_WORKER_MEMORY_MB', 128))  # Resident size of one app worker
+master_memory_mb = int(os.environ.get('WEB_MASTER_MEMORY_MB', 64))  # Headroom for the arbiter
+
+# Each worker also runs its own password-hashing pool (see password_hashing.py):
+# a fork server and a resource tracker (about 15 MiB each), plus
+# PASSWORD_HASH_WORKERS children that peak near 56 MiB while scrypt holds its 32 MiB buffer.
+hash_workers = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))  # Same variable as config.py
+hash_pool_memory_mb = int(os.environ.get('WEB_HASH_POOL_MEMORY_MB', 32)) if hash_workers else 0
+hash_child_memory_mb = int(os.environ.get('WEB_HASH_CHILD_MEMORY_MB', 64))
+worker_total_memory_mb = worker_memory_mb + hash_pool_memory_mb + hash_workers * hash_child_memory_mb
+
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+
+if worker_class == 'gevent':
+    # One process per CPU; concurrency comes from greenlets.
+    default_workers = max(1, math.ceil(cpus))
+else:
+    # Requests spend most of their time waiting on SerpApi and the LLM, so two
+    # processes per CPU with a handful of threads each keeps the CPU busy.
+    default_workers = max(1, math.ceil(cpus * 2))
+if memory_mb is not None:
+    default_workers = max(1, min(default_workers, (memory_mb - master_memory_mb) // worker_total_memory_mb))
+
+workers = int(os.environ.get('WEB_CONCURRENCY', default_workers))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_connections = int(os.environ.get('WEB_WORKER_CONNECTIONS', 100))
+
+# ---------------------------
+# Server settings
+# ---------------------------
+
+bind = os.environ.get('WEB_BIND', '0.0.0.0:5000')
+
+# Import the app once in the master so workers fork with it already loaded.
+# gevent monkey-patches inside the worker, after a preloaded import would have
+# created real threads and locks, so preload is off by default for gevent.
+preload_app = os.environ.get('WEB_PRELOAD', '0' if worker_class == 'gevent' else '1') == '1'
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))  # Hard kill for a stuck worker
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))  # Time to finish in-flight requests on reload/stop
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+# Recycle workers periodically so in-process caches and fragmentation cannot grow unbounded.
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 5000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 500))
+
+# Heartbeat files on tmpfs; a disk-backed /tmp in a container can stall workers.
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None  # Empty disables the access log
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
+
+# ---------------------------
+# Hooks
+# ---------------------------
+
+def on_starting(server):
+    server.log.info(
+        "Sizing for %.2f CPU / %s MiB: %d %s worker(s) at %d MiB each (%d hashing process(es)), %d thread(s), preload=%s",
+        cpus, memory_mb if memory_mb is not None else 'unlimited', workers, worker_class, worker_total_memory_mb,
+        hash_workers, threads, preload_app
+    )
+
+def _services(worker):
+    # The app's services (see app.init_services()), or None if the worker never loaded the app
+    application = getattr(worker, 'wsgi', None)
+    return getattr(application, 'extensions', {}).get('services')
+
+def post_worker_init(worker):
+    # Start this worker's password-hashing processes before the first login needs them.
+    services = _services(worker)
+    if services is not None:
+        services.password_hasher.start()
+
+def worker_exit(server, worker):
+    # Flush queued search-history rows before the worker goes away (reload, max_requests, stop).
+    services = _services(worker)
+    if services is not None:
+        services.shutdown()
@@ -0,0 +1,141 @@
+# history_search.py
+import re
+
+from markupsafe import Markup, escape
+from sqlalchemy import DateTime, text
+
+# ---------------------------
+# Full-text index over search history
+# ---------------------------
+
+# One row per Search row. The FTS rowid is `author_id << 32 | search.id`, so each
+# user's rows form one contiguous rowid range: a lookup seeks straight into that
+# range of each term's doclist instead of intersecting with every user's matches.
+# This assumes search ids stay below 2**32.
+CREATE_INDEX_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+    " search_query, result_titles, result_snippets,"
+    " tokenize = 'porter unicode61', prefix = '2 3')"
+)
+
+# bm25 column weights: query, result titles, result snippets. Stored as the table's
+# rank function so ORDER BY rank only runs highlight()/snippet() on the rows returned.
+SET_RANK_SQL = "INSERT INTO search_fts (search_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0)')"
+
+# Deleting a search removes it from the index; rows are added by index_searches().
+CREATE_DELETE_TRIGGER_SQL = (
+    "CREATE TRIGGER IF NOT EXISTS search_fts_delete AFTER DELETE ON search BEGIN"
+    " DELETE FROM search_fts WHERE rowid = (old.author_id << 32) | old.id;"
+    " END"
+)
+
+ROWID_SEARCH_MASK = (1 << 32) - 1
+
+# Highlight markers; control characters cannot come from user text after tokenising.
+MARK_START, MARK_END = '\x02', '\x03'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Left out of queries that have other words. They appear in most rows, and bm25
+# reads a term's entire doclist, across all users, to weight it.
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have how i in is it its of on or that the'
+    ' their this to was were what when where which who why will with you your'.split()
+)
+
+def index_rowid(author_id, search_id):
+    return (author_id << 32) | search_id
+
+def result_documents(results):
+    """
+    Return `(titles, snippets)` text to index for a page of results.
+    """
+    titles = '\n'.join(result.get('name') or '' for result in results)
+    snippets = '\n'.join(result.get('snippet') or '' for result in results)
+    return titles, snippets
+
+def build_match_query(query):
+    """
+    Turn free text into `(fts_query, ranked)`, or `(None, False)` if it has no words.
+
+    Words are quoted so FTS5 operators in user input are matched literally. A
+    trailing `*` makes the last word a prefix match; it is not the default because
+    a short prefix can expand to hundreds of terms. Prefix queries and queries made
+    only of stopwords are not ranked (`ranked` is False) and list newest first, as
+    bm25 would have to weigh a term found in a large share of the index.
+    """
+    words = TOKEN_RE.findall(query.lower())
+    if not words:
+        return None, False
+    terms = [f'"{word}"' for word in words]
+    prefix = query.rstrip().endswith('*')
+    if prefix:
+        terms[-1] += '*'
+    kept = [term for word, term in zip(words, terms) if word not in STOPWORDS or term.endswith('*')]
+    return ' '.join(kept or terms), bool(kept) and not prefix
+
+def index_searches(session, rows):
+    """
+    Add `(search_id, author_id, search_query, titles, snippets)` rows to the index.
+    Runs in the caller's transaction.
+    """
+    session.execute(
+        text(
+            "INSERT INTO search_fts (rowid, search_query, result_titles, result_snippets)"
+            " VALUES (:rowid, :search_query, :titles, :snippets)"
+        ),
+        [
+            {'rowid': index_rowid(author_id, search_id), 'search_query': query,
+             'titles': titles, 'snippets': snippets}
+            for search_id, author_id, query, titles, snippets in rows
+        ],
+    )
+
+def search_history_index(session, user_id, query, limit=20, offset=0):
+    """
+    Return up to `limit` of the user's past searches matching `query`, best first
+    (or newest first, see build_match_query()).
+
+    Each row has id, search_query, timestamp, query_html (the query with matches
+    highlighted) and context_html (a highlighted excerpt of the results, if they matched).
+    """
+    match, ranked = build_match_query(query)
+    if match is None:
+        return []
+    # Selecting `rank` at all runs bm25, so unranked queries sort on rowid alone.
+    rank_column, order_by = (', rank', 'rank') if ranked else ('', 'rowid DESC')
+    rows = session.execute(
+        text(
+            "SELECT search.id, search.search_query, search.timestamp, hits.query_marked,"
+            " hits.titles_marked, hits.snippets_marked FROM ("
+            f" SELECT rowid{rank_column}, highlight(search_fts, 0, '{MARK_START}', '{MARK_END}') AS query_marked,"
+            f" snippet(search_fts, 1, '{MARK_START}', '{MARK_END}', '…', 12) AS titles_marked,"
+            f" snippet(search_fts, 2, '{MARK_START}', '{MARK_END}', '…', 16) AS snippets_marked"
+            " FROM search_fts WHERE search_fts MATCH :match AND rowid BETWEEN :first AND :last"
+            f" ORDER BY {order_by} LIMIT :limit OFFSET :offset"
+            f") AS hits JOIN search ON search.id = (hits.rowid & {ROWID_SEARCH_MASK})"
+            f" ORDER BY hits.{order_by}"
+        ).columns(timestamp=DateTime),
+        {'match': match, 'first': index_rowid(user_id, 0), 'last': index_rowid(user_id, ROWID_SEARCH_MASK),
+         'limit': limit, 'offset': offset},
+    ).mappings().all()
+
+    hits = []
+    for row in rows:
+        context = next((marked for marked in (row['titles_marked'], row['snippets_marked'])
+                        if marked and MARK_START in marked), '')
+        hits.append({
+            'id': row['id'],
+            'search_query': row['search_query'],
+            'timestamp': row['timestamp'],
+            'query_html': highlight_html(row['query_marked']),
+            'context_html': highlight_html(context),
+        })
+    return hits
+
+def highlight_html(marked):
+    """
+    Escape FTS output and turn the match markers into <mark> tags.
+    """
+    html = str(escape(marked or ''))
+    return Markup(html.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
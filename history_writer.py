@@ -0,0 +1,125 @@
+# history_writer.py
+import logging
+import os
+import queue
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Write-behind search history recorder
+# ---------------------------
+
+class HistoryWriter:
+    """
+    Buffers search-history rows in memory and writes them in batches.
+
+    `record()` never touches the database; it only enqueues. A background thread
+    hands batches to `flush(rows)` once `batch_size` rows are waiting or
+    `flush_interval` seconds have passed since the first of them arrived. When
+    the queue is full, new rows are dropped and counted instead of blocking the
+    request.
+    """
+
+    def __init__(self, flush, batch_size=100, flush_interval=1.0, max_queue=10000):
+        self.flush = flush
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stopping = threading.Event()
+
+    def record(self, row):
+        """
+        Enqueue one row. Returns False if it was dropped because the queue is full.
+        """
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning("Search history queue full; dropping row")
+            return False
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queue_depth': self.queue_depth(),
+                'written': self.written,
+                'dropped': self.dropped,
+                'failed': self.failed,
+            }
+
+    def stop(self, timeout=5.0):
+        """
+        Flush everything still queued and stop the background thread.
+        """
+        self._stopping.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        # Anything enqueued after the thread exited (or if it never started)
+        self._drain()
+
+    def _ensure_started(self):
+        # Started lazily, and again after a fork, since threads do not survive fork().
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+        self._drain()
+
+    def _drain(self):
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    def _write(self, batch):
+        try:
+            self.flush(batch)
+            with self._lock:
+                self.written += len(batch)
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            logger.error("Failed to write %d search history rows: %s", len(batch), e, exc_info=True)
@@ -0,0 +1,94 @@
+# http_cache.py
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli  # Optional; without it responses are only gzipped
+except ImportError:
+    brotli = None
+
+# ---------------------------
+# ETags
+# ---------------------------
+
+def make_etag(*parts):
+    """
+    Strong ETag value for a page built from `parts` (anything with a stable repr).
+    """
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:24]
+
+def matching_etag(request, etag):
+    """
+    Return the ETag from If-None-Match that `etag` satisfies, or None.
+
+    Compressed responses carry `<etag>-<encoding>` (see compress_response()),
+    so those variants count as the same page.
+    """
+    for candidate in (etag, f"{etag}-br", f"{etag}-gzip"):
+        if request.if_none_match.contains(candidate):
+            return candidate
+    return None
+
+def template_version(template_dir):
+    """
+    Digest of every template under `template_dir`, so ETags change when the markup does.
+    """
+    digest = hashlib.sha1()
+    for root, dirs, files in sorted(os.walk(template_dir)):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, template_dir).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+# ---------------------------
+# Compression
+# ---------------------------
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'text/html', 'text/plain', 'text/css', 'text/csv', 'application/json', 'application/javascript',
+})
+
+def available_encodings():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def choose_encoding(request):
+    """
+    The client's preferred encoding among those available, or None for identity.
+    """
+    return request.accept_encodings.best_match(available_encodings())
+
+def compress_response(response, encoding, min_size=1024, gzip_level=6, brotli_quality=5):
+    """
+    Compress `response` in place with `encoding` if it is worth it; return the encoding used, or None.
+
+    Streamed and passthrough responses (file downloads, CSV export) are left
+    alone, as are bodies under `min_size` bytes or ones that would not shrink.
+    """
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return None
+    response.vary.add('Accept-Encoding')
+    if (encoding is None or response.status_code != 200 or response.direct_passthrough
+            or response.is_streamed or 'Content-Encoding' in response.headers):
+        return None
+
+    body = response.get_data()
+    if len(body) < min_size:
+        return None
+    if encoding == 'br':
+        compressed = brotli.compress(body, quality=brotli_quality)
+    else:
+        compressed = gzip.compress(body, compresslevel=gzip_level, mtime=0)
+    if len(compressed) >= len(body):
+        return None
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    etag, weak = response.get_etag()
+    if etag:
+        # Each encoding is a different representation, so it gets its own ETag.
+        response.set_etag(f"{etag}-{encoding}", weak)
+    return encoding
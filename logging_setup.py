@@ -0,0 +1,135 @@
+# logging_setup.py
+import atexit
+import json
+import logging
+import os
+import queue
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+# ---------------------------
+# Structured, non-blocking logging
+# ---------------------------
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is emitted as a field.
+_STANDARD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+class JsonFormatter(logging.Formatter):
+    """
+    Render each record as one JSON object per line.
+    """
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'line': record.lineno,
+            'thread': record.threadName,
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class LocalQueueHandler(QueueHandler):
+    """
+    QueueHandler for an in-process queue.
+
+    The stock prepare() fully formats the record on the calling thread. Here
+    only the message and traceback text are resolved (so later mutation of
+    the arguments cannot change the log line); JSON rendering happens on the
+    listener thread.
+    """
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def parse_log_levels(spec):
+    """
+    Parse 'werkzeug=WARNING,result_cache=DEBUG' into {'werkzeug': 'WARNING', ...}.
+    """
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, level = item.partition('=')
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+def make_output_handler(log_file):
+    """
+    JSON lines to stderr for LOG_FILE '-', else appended to the file.
+
+    gunicorn's master and workers all write here, so no process may rotate the
+    file itself: one would rename it out from under the others. A file is
+    instead reopened whenever it is moved, so logrotate (or similar) can rotate it.
+    """
+    if log_file == '-':
+        return logging.StreamHandler(sys.stderr)
+    return WatchedFileHandler(log_file)
+
+def configure_logging(config):
+    """
+    Route all logging through a queue to JSON lines on stderr or in LOG_FILE.
+
+    Request threads only enqueue records; a QueueListener thread formats them
+    and does the I/O. Returns the listener so callers can stop it.
+    """
+    output_handler = make_output_handler(config['LOG_FILE'])
+    output_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.Queue(-1)
+    queue_handler = LocalQueueHandler(log_queue)
+    listener = QueueListener(log_queue, output_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(config['LOG_LEVEL'].upper())
+
+    for name, level in parse_log_levels(config['LOG_LEVELS']).items():
+        logging.getLogger(name).setLevel(level)
+
+    global _active
+    stop_listener()  # The previous configuration's, if any
+    listener.start()
+    _active = (queue_handler, listener)
+    return listener
+
+# The queue handler and listener installed by the last configure_logging() call
+_active = None
+
+def stop_listener():
+    """
+    Write out everything queued and stop the listener thread.
+    """
+    if _active is not None and _active[1]._thread is not None:
+        _active[1].stop()
+
+def restart_in_child():
+    # The listener thread does not survive fork(); give each worker its own.
+    if _active is None:
+        return
+    queue_handler, listener = _active
+    fresh_queue = queue.Queue(-1)
+    queue_handler.queue = fresh_queue
+    listener.queue = fresh_queue
+    listener._thread = None
+    listener.start()
+
+# Registered once, however many apps configure logging
+atexit.register(stop_listener)
+os.register_at_fork(after_in_child=restart_in_child)
@@ -0,0 +1,225 @@
+# metrics.py
+import bisect
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# ---------------------------
+# In-process metrics registry
+# ---------------------------
+
+# Upper bounds in seconds; covers cache hits (sub-millisecond) through slow upstream calls.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus style.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    Counters and histograms aggregated in this process, rendered as Prometheus text.
+
+    Each worker process keeps its own registry; nothing is shared or pushed
+    anywhere. Values owned by other objects (cache stats, queue depths) are read
+    at scrape time through collectors registered with add_collector().
+    """
+
+    def __init__(self, namespace='sigmawall'):
+        self.namespace = namespace
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def describe(self, name, kind, help_text):
+        """
+        Set the TYPE and HELP lines for `name`.
+        """
+        self._help[name] = (kind, help_text)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def add_collector(self, collect):
+        """
+        Register `collect()`, which returns `(name, kind, help, labels, value)` samples at scrape time.
+        Registering the same function again has no effect.
+        """
+        if collect not in self._collectors:
+            self._collectors.append(collect)
+
+    def render(self):
+        """
+        Return every metric in the Prometheus text exposition format.
+        """
+        families = {}
+
+        def family(name, kind):
+            if name not in families:
+                described_kind, help_text = self._help.get(name, (kind, ''))
+                families[name] = (described_kind, help_text, [])
+            return families[name][2]
+
+        with self._lock:
+            for (name, labels), value in self._counters.items():
+                family(name, 'counter').append((name, dict(labels), value))
+            for (name, labels), histogram in self._histograms.items():
+                samples = family(name, 'histogram')
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    samples.append((f"{name}_bucket", dict(labels, le=le), cumulative))
+                samples.append((f"{name}_sum", dict(labels), histogram.sum))
+                samples.append((f"{name}_count", dict(labels), histogram.count))
+
+        for collect in self._collectors:
+            for name, kind, help_text, labels, value in collect():
+                self._help.setdefault(name, (kind, help_text))
+                family(name, kind).append((name, labels, value))
+
+        lines = []
+        for name in sorted(families):
+            kind, help_text, samples = families[name]
+            full_name = f"{self.namespace}_{name}"
+            if help_text:
+                lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{self.namespace}_{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+registry = MetricsRegistry()
+registry.describe('span_seconds', 'histogram', 'Time spent in instrumented sections of a request.')
+
+# ---------------------------
+# Request timings (Server-Timing)
+# ---------------------------
+
+class RequestTimings:
+    """
+    Spans recorded while serving one request, possibly from several threads.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self._spans.append((name, seconds))
+
+    def server_timing(self):
+        """
+        Render a Server-Timing header value; repeated spans are summed.
+        """
+        totals = {}
+        with self._lock:
+            for name, seconds in self._spans:
+                totals[name] = totals.get(name, 0.0) + seconds
+        totals['total'] = time.perf_counter() - self.start
+        return ', '.join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
+
+_current_timings = contextvars.ContextVar('request_timings', default=None)
+
+def start_request():
+    """
+    Begin collecting spans for the current request and return its RequestTimings.
+    """
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+def end_request():
+    _current_timings.set(None)
+
+def current_timings():
+    return _current_timings.get()
+
+@contextmanager
+def use_timings(timings):
+    """
+    Report spans to `timings`, e.g. in a worker thread doing part of a request.
+    """
+    token = _current_timings.set(timings)
+    try:
+        yield
+    finally:
+        _current_timings.reset(token)
+
+# ---------------------------
+# Spans
+# ---------------------------
+
+@contextmanager
+def span(name, server_timing=True):
+    """
+    Time the enclosed block into the span_seconds histogram and the current request's timings.
+    With `server_timing=False` the span is kept out of the Server-Timing header,
+    for work whose duration would tell the client something it should not learn.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start, server_timing)
+
+def record_span(name, seconds, server_timing=True):
+    """
+    Record a span measured elsewhere, e.g. between two event hooks.
+    """
+    registry.observe('span_seconds', seconds, span=name)
+    timings = _current_timings.get()
+    if timings is not None and server_timing:
+        timings.add(name, seconds)
+
+def timed(name):
+    """
+    Decorator form of span().
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
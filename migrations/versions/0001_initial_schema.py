@@ -0,0 +1,63 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Databases created by db.create_all() already have these tables;
+    # only create what is missing so they can be stamped onto this history.
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'user' not in existing:
+        op.create_table(
+            'user',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('username', sa.String(length=150), nullable=False),
+            sa.Column('password_hash', sa.String(length=128), nullable=False),
+            sa.Column('preferences', sa.Text(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('username'),
+        )
+
+    if 'search' not in existing:
+        op.create_table(
+            'search',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('search_query', sa.String(length=500), nullable=False),
+            sa.Column('timestamp', sa.DateTime(), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+            sa.Column('author_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['author_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+
+    if 'user_term' not in existing:
+        op.create_table(
+            'user_term',
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('term', sa.String(length=100), nullable=False),
+            sa.Column('count', sa.Integer(), nullable=False),
+            sa.Column('weight', sa.Float(), nullable=False),
+            sa.Column('last_seen', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['user_id'], ['user.id']),
+            sa.PrimaryKeyConstraint('user_id', 'term'),
+        )
+        op.create_index('ix_user_term_user_weight', 'user_term', ['user_id', 'weight'])
+
+
+def downgrade():
+    op.drop_table('user_term')
+    op.drop_table('search')
+    op.drop_table('user')
@@ -0,0 +1,28 @@
+"""index search by author and timestamp
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # IF NOT EXISTS: db.create_all() builds this index on fresh databases.
+    op.execute(
+        'CREATE INDEX IF NOT EXISTS ix_search_author_timestamp '
+        'ON search (author_id, timestamp DESC)'
+    )
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_search_author_timestamp')
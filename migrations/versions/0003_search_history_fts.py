@@ -0,0 +1,42 @@
+"""full-text index over search history
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # IF NOT EXISTS: db.create_all() builds these on fresh databases.
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+        " search_query, result_titles, result_snippets,"
+        " tokenize = 'porter unicode61', prefix = '2 3')"
+    )
+    op.execute("INSERT INTO search_fts (search_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0)')")
+    op.execute(
+        "CREATE TRIGGER IF NOT EXISTS search_fts_delete AFTER DELETE ON search BEGIN"
+        " DELETE FROM search_fts WHERE rowid = (old.author_id << 32) | old.id;"
+        " END"
+    )
+    # Result text was never stored for existing rows, so only their queries are indexed.
+    op.execute(
+        "INSERT INTO search_fts (rowid, search_query, result_titles, result_snippets) "
+        "SELECT (author_id << 32) | id, search_query, '', '' FROM search "
+        "WHERE (author_id << 32) | id NOT IN (SELECT rowid FROM search_fts)"
+    )
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS search_fts_delete')
+    op.execute('DROP TABLE IF EXISTS search_fts')
@@ -0,0 +1,38 @@
+"""store user_term weights as log2
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def _rewrite_weights(convert):
+    conn = op.get_bind()
+    rows = conn.execute(sa.text("SELECT user_id, term, weight FROM user_term")).all()
+    if rows:
+        conn.execute(
+            sa.text("UPDATE user_term SET weight = :weight WHERE user_id = :user_id AND term = :term"),
+            [{'user_id': user_id, 'term': term, 'weight': convert(weight)} for user_id, term, weight in rows],
+        )
+
+
+def upgrade():
+    # Decayed weights grow as 2 ** (days / half-life) and overflow a float; keep their log2 instead.
+    _rewrite_weights(lambda weight: math.log2(weight) if weight > 0 else 0.0)
+
+
+def downgrade():
+    # Weights past the float range are clamped.
+    _rewrite_weights(lambda weight: 2.0 ** min(weight, 1023.0))
@@ -0,0 +1,38 @@
+"""per-user search history version counter
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# Same statements as app.HISTORY_VERSION_TRIGGERS_SQL, frozen at this revision
+TRIGGERS = [
+    f"CREATE TRIGGER IF NOT EXISTS search_history_version_{event.lower()} AFTER {event} ON search BEGIN"
+    f" UPDATE \"user\" SET history_version = history_version + 1 WHERE id = {row}.author_id;"
+    " END"
+    for event, row in (('INSERT', 'new'), ('DELETE', 'old'))
+]
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('history_version', sa.Integer(), nullable=False, server_default='0'))
+    for trigger in TRIGGERS:
+        op.execute(trigger)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS search_history_version_insert')
+    op.execute('DROP TRIGGER IF EXISTS search_history_version_delete')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('history_version')
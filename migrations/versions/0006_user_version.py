@@ -0,0 +1,35 @@
+"""user row version for the authenticated-user cache
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-21 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='0'))
+    # Same statement as app.USER_VERSION_TRIGGER_SQL, frozen at this revision
+    op.execute(
+        'CREATE TRIGGER IF NOT EXISTS user_version_update'
+        ' AFTER UPDATE OF username, password_hash, preferences ON "user" BEGIN'
+        ' UPDATE "user" SET version = version + 1 WHERE id = new.id;'
+        ' END'
+    )
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS user_version_update')
+    # In place (SQLite 3.35+): batch mode would rebuild "user" under a temporary
+    # name, which the search table's history_version triggers refuse.
+    op.execute('ALTER TABLE "user" DROP COLUMN version')
@@ -0,0 +1,192 @@
+# password_hashing.py
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Hash methods
+# ---------------------------
+
+def normalize_method(method):
+    """
+    Spell out the parameters Werkzeug fills in ('scrypt' -> 'scrypt:32768:8:1'),
+    giving the exact prefix Werkzeug stores in front of the salt.
+    """
+    name, *params = method.split(':')
+    if name == 'scrypt':
+        defaults = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        defaults = ['sha256', str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        raise ValueError(f"Unsupported password hash method: {method!r}")
+    if len(params) > len(defaults):
+        raise ValueError(f"Too many parameters for {name}: {method!r}")
+    return ':'.join([name, *params, *defaults[len(params):]])
+
+# Run in the pool's processes; module-level so they can be pickled by name.
+
+def _init_worker(nice):
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+
+def _hash(password, method, salt_length):
+    return generate_password_hash(password, method=method, salt_length=salt_length)
+
+def _verify(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+# ---------------------------
+# Bounded hashing pool
+# ---------------------------
+
+class HasherBusy(Exception):
+    """
+    Raised when a hash could not be computed in time: the queue was full or the hash timed out.
+    """
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords in a small process pool, off the request threads.
+
+    Key stretching is deliberately slow CPU work. Done inline, a burst of logins
+    occupies every request thread and competes with page requests for the CPU.
+    Here at most `workers` hashes run at once per app worker, at a lower
+    scheduling priority (`nice`), and at most `max_pending` may be queued or
+    running; beyond that callers get HasherBusy straight away instead of waiting.
+
+    With `workers=0` hashes run on the calling thread, unbounded, as before.
+    The pool is started on first use and again after a fork, so it is never
+    shared between gunicorn workers.
+    """
+
+    def __init__(self, method='scrypt', salt_length=16, workers=1, max_pending=8, timeout=5.0, nice=0):
+        self.method = normalize_method(method)
+        self.salt_length = salt_length
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.nice = nice
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._pending = 0
+        # Well-formed but matches no password; checking against it costs a real verify
+        self._dummy_hash = f"{self.method}${'0' * salt_length}${'0' * 64}"
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        """
+        Return a salted hash of `password` with the configured method.
+        """
+        return self._run(_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        """
+        Return True if `password` matches `pwhash`, whatever method it was hashed with.
+        """
+        return self._run(_verify, pwhash, password)
+
+    def verify_dummy(self, password):
+        """
+        Check `password` against a hash no password matches, taking as long as verify().
+        Used for unknown usernames so response times do not reveal which accounts exist.
+        """
+        return self.verify(self._dummy_hash, password)
+
+    def needs_rehash(self, pwhash):
+        """
+        True if `pwhash` was made with a method or parameters other than the configured ones.
+        """
+        return pwhash.split('$', 1)[0] != self.method
+
+    def start(self):
+        """
+        Start the pool's processes now rather than on the first login (e.g. from gunicorn's post_fork).
+        """
+        if self.workers:
+            with self._lock:
+                executor = self._get_executor()
+            for _ in range(self.workers):
+                executor.submit(os.getpid)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            result = fn(*args)
+            with self._lock:
+                self.completed += 1
+            return result
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HasherBusy(f"{self._pending} password hashes already pending")
+            self._pending += 1
+            executor = self._get_executor()
+
+        try:
+            future = executor.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            self._release()
+            self._reset(executor, e)
+            raise HasherBusy("Password hashing pool unavailable") from e
+        future.add_done_callback(self._release)
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel()  # Still counts as pending if it already started, until it finishes
+            with self._lock:
+                self.timeouts += 1
+            raise HasherBusy(f"Password hash took longer than {self.timeout}s") from None
+        except BrokenProcessPool as e:
+            self._reset(executor, e)
+            raise HasherBusy("Password hashing pool unavailable") from e
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+            if future is not None and not future.cancelled() and future.exception() is None:
+                self.completed += 1
+
+    def _get_executor(self):
+        # Called with self._lock held
+        if self._executor is None or self._pid != os.getpid():
+            # The fork start method copies the parent's threads' locks mid-use; a
+            # fork server starts each hashing process from a clean interpreter.
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+            self._executor = ProcessPoolExecutor(
+                self.workers, mp_context=context, initializer=_init_worker, initargs=(self.nice,)
+            )
+            self._pid = os.getpid()
+        return self._executor
+
+    def _reset(self, executor, error):
+        logger.warning("Restarting password hashing pool: %s", error)
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,68 @@
+# prefetch.py
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Background result-page prefetcher
+# ---------------------------
+
+class Prefetcher:
+    """
+    Warms the result cache for pages the user is likely to request next.
+
+    Work runs on a small thread pool. At most `max_pending` prefetches may be
+    queued or running in total, and at most `per_user_limit` for any one user;
+    requests beyond either limit are dropped rather than queued, so a burst of
+    page views can never turn into a burst of upstream calls.
+    """
+
+    def __init__(self, fetch, max_workers=2, max_pending=16, per_user_limit=2):
+        self.fetch = fetch
+        self.max_pending = max_pending
+        self.per_user_limit = per_user_limit
+        self.scheduled = 0
+        self.dropped = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._per_user = {}
+        self._in_flight = set()
+
+    def schedule(self, user_key, *args):
+        """
+        Queue `fetch(*args)` on behalf of `user_key`. Returns False if it was dropped.
+        """
+        with self._lock:
+            if (args in self._in_flight
+                    or self._pending >= self.max_pending
+                    or self._per_user.get(user_key, 0) >= self.per_user_limit):
+                self.dropped += 1
+                return False
+            self._in_flight.add(args)
+            self._pending += 1
+            self._per_user[user_key] = self._per_user.get(user_key, 0) + 1
+            self.scheduled += 1
+
+        self._executor.submit(self._run, user_key, args)
+        return True
+
+    def _run(self, user_key, args):
+        try:
+            self.fetch(*args)
+        except Exception as e:
+            logger.warning("Prefetch of %s failed: %s", args, e)
+        finally:
+            with self._lock:
+                self._in_flight.discard(args)
+                self._pending -= 1
+                remaining = self._per_user[user_key] - 1
+                if remaining:
+                    self._per_user[user_key] = remaining
+                else:
+                    del self._per_user[user_key]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
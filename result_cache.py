@@ -0,0 +1,137 @@
+# result_cache.py
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# SerpApi result cache
+# ---------------------------
+
+def normalize_query(query):
+    """
+    Normalise a query for cache lookups: case-folded, whitespace collapsed.
+    """
+    return ' '.join(query.lower().split())
+
+def make_result_key(query, page, hl, gl, domain):
+    """
+    Build the cache key for one page of results.
+    """
+    return f"serp|{normalize_query(query)}|{page}|{hl}|{gl}|{domain}"
+
+class ResultCache:
+    """
+    Stale-while-revalidate cache of SerpApi result pages.
+
+    Entries younger than `ttl` seconds are served as-is. Entries older than
+    `ttl` but younger than `ttl + stale_ttl` are still served, and a background
+    thread refreshes them so the next reader gets fresh data. Anything older is
+    treated as a miss and fetched inline.
+    """
+
+    def __init__(self, store, ttl=3600, stale_ttl=86400):
+        self.store = store
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.stale_on_error = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get_or_fetch(self, key, fetch):
+        """
+        Return the cached value for `key`, calling `fetch()` to fill it when needed.
+
+        `fetch` must raise on failure; failed fetches are never cached. If the
+        fetch fails and any cached value exists, however old, it is returned
+        instead of the error (stale-if-error).
+        """
+        return self.get_or_fetch_entry(key, fetch)[0]
+
+    def get_or_fetch_entry(self, key, fetch):
+        """
+        Like get_or_fetch(), but return `(value, stored_at)`. `stored_at` changes
+        whenever the entry is replaced, so it doubles as the value's version.
+        """
+        entry = self.store.get(key)
+        if entry is not None:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                logger.debug("Result cache hit for %s (age %.0fs)", key, age)
+                self._count('hits')
+                return entry
+            if age < self.ttl + self.stale_ttl:
+                logger.debug("Result cache stale hit for %s (age %.0fs)", key, age)
+                self._count('stale_hits')
+                self._refresh_in_background(key, fetch)
+                return entry
+
+        logger.debug("Result cache miss for %s", key)
+        self._count('misses')
+        try:
+            value = fetch()
+        except Exception as e:
+            if entry is None:
+                raise
+            logger.warning("Serving expired result for %s after fetch error: %s", key, e)
+            self._count('stale_on_error')
+            return entry
+        return value, self.store.set(key, value)
+
+    def get_fresh(self, key):
+        """
+        Return the cached value for `key` if it is younger than `ttl`, else None.
+        """
+        entry = self.store.get(key)
+        if entry is not None and time.time() - entry[1] < self.ttl:
+            return entry[0]
+        return None
+
+    def is_fresh(self, key):
+        return self.get_fresh(key) is not None
+
+    def put(self, key, value):
+        """
+        Store a value fetched outside get_or_fetch(), e.g. by a prefetcher.
+        """
+        self.store.set(key, value)
+
+    def stats(self):
+        """
+        Return lookup counters for get_or_fetch(); stale hits count towards the hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                'hits': self.hits,
+                'stale_hits': self.stale_hits,
+                'misses': self.misses,
+                'stale_on_error': self.stale_on_error,
+                'hit_ratio': (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _refresh_in_background(self, key, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                self.store.set(key, fetch())
+            except Exception as e:
+                logger.warning("Background refresh failed for %s: %s", key, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
@@ -0,0 +1,97 @@
+# rewrite_cache.py
+import logging
+import threading
+import time
+
+from cache_store import LRUCache
+from result_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Personalised query rewrite cache
+# ---------------------------
+
+def make_rewrite_key(query, relevant_preferences, model, prompt_version):
+    """
+    Build the cache key for one LLM rewrite.
+    Preferences are de-duplicated and sorted so their order does not matter.
+    """
+    prefs = ','.join(sorted({pref.strip().lower() for pref in relevant_preferences}))
+    return f"rewrite|{prompt_version}|{model}|{prefs}|{normalize_query(query)}"
+
+class RewriteCache:
+    """
+    Two-tier cache for personalised queries.
+
+    The first tier is an in-process LRU; the optional second tier is a
+    SQLiteCache that survives restarts and is shared between workers. Disk hits
+    are promoted into memory. Entries expire after `ttl` seconds in both tiers.
+    """
+
+    def __init__(self, max_entries=2048, ttl=604800, store=None):
+        self.memory = LRUCache(max_entries)
+        self.store = store
+        self.ttl = ttl
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        Return the cached rewrite for `key`, or None.
+        """
+        value, tier = self._lookup(key)
+        self._count({'memory': 'hits', 'disk': 'disk_hits'}.get(tier, 'misses'))
+        return value
+
+    def peek(self, key):
+        """
+        Like get(), but without touching the hit/miss counters.
+        """
+        return self._lookup(key)[0]
+
+    def _lookup(self, key):
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None and now - entry[1] < self.ttl:
+            return entry[0], 'memory'
+
+        if self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except Exception as e:
+                logger.warning("Rewrite cache disk read failed: %s", e)
+                entry = None
+            if entry is not None and now - entry[1] < self.ttl:
+                self.memory.set(key, entry)
+                return entry[0], 'disk'
+
+        return None, None
+
+    def set(self, key, value):
+        self.memory.set(key, (value, time.time()))
+        if self.store is not None:
+            try:
+                self.store.set(key, value)
+            except Exception as e:
+                logger.warning("Rewrite cache disk write failed: %s", e)
+
+    def stats(self):
+        """
+        Return hit/miss counters and the current in-memory size.
+        """
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                'size': len(self.memory),
+            }
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
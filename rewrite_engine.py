@@ -0,0 +1,189 @@
+# rewrite_engine.py
+import logging
+import threading
+import time
+
+from result_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Tiered query rewrite engine
+# ---------------------------
+
+class RewriteEngine:
+    """
+    Personalises a query by asking a list of tiers in order.
+
+    Each tier has a `name` and a `rewrite(query, relevant_preferences)` method
+    returning a rewritten query, or None when it has no confident answer. The
+    first answer wins and is passed through `accept(query, candidate)`. Earlier
+    tiers with an `observe(query, relevant_preferences, result)` method are shown
+    the answer, which is how the learned tier picks up the LLM's rewrites.
+    """
+
+    def __init__(self, tiers, accept=None):
+        self.tiers = tiers
+        self.accept = accept or (lambda query, candidate: candidate)
+        self._stats = {tier.name: {'calls': 0, 'answered': 0, 'seconds': 0.0} for tier in tiers}
+        self._lock = threading.Lock()
+
+    def rewrite(self, query, relevant_preferences):
+        """
+        Return the personalised query. Falls back to `query` if no tier answers.
+        """
+        for index, tier in enumerate(self.tiers):
+            start = time.perf_counter()
+            candidate = tier.rewrite(query, relevant_preferences)
+            self._record(tier.name, candidate is not None, time.perf_counter() - start)
+            if candidate is None:
+                continue
+
+            result = self.accept(query, candidate)
+            logger.debug("Rewrite tier '%s' answered '%s' -> '%s'", tier.name, query, result)
+            for earlier in self.tiers[:index]:
+                if hasattr(earlier, 'observe'):
+                    earlier.observe(query, relevant_preferences, result)
+            return result
+        return query
+
+    def stats(self):
+        """
+        Per tier: how often it was asked, how often it answered, and mean latency in ms.
+        """
+        with self._lock:
+            return {
+                name: {
+                    'calls': s['calls'],
+                    'answered': s['answered'],
+                    'answer_rate': s['answered'] / s['calls'] if s['calls'] else 0.0,
+                    'mean_ms': s['seconds'] * 1000 / s['calls'] if s['calls'] else 0.0,
+                }
+                for name, s in self._stats.items()
+            }
+
+    def _record(self, name, answered, seconds):
+        with self._lock:
+            s = self._stats[name]
+            s['calls'] += 1
+            s['answered'] += int(answered)
+            s['seconds'] += seconds
+
+# ---------------------------
+# Tiers
+# ---------------------------
+
+class RuleTier:
+    """
+    Answers the unambiguous cases locally.
+
+    If the query already mentions every relevant preference it is returned as
+    is; if exactly one preference is relevant it is prefixed to the query, which
+    is what the LLM prompt's examples do. Anything else is left to later tiers.
+    """
+
+    name = 'rules'
+
+    def __init__(self, taxonomy):
+        self.taxonomy = taxonomy
+
+    def rewrite(self, query, relevant_preferences):
+        mentioned = self.taxonomy.phrase_trie.find_all(query.lower().split())
+        if all(pref in mentioned for pref in relevant_preferences):
+            return query
+        if len(relevant_preferences) == 1:
+            return f"{relevant_preferences[0]} {query}"
+        return None
+
+class LearnedTier:
+    """
+    Learns how the LLM rewrites queries for each preference set and replays it.
+
+    Accepted rewrites that add words before or after the original query are
+    recorded as patterns, per preference set. Once one pattern has been seen
+    `min_support` times and accounts for `min_confidence` of the observations,
+    it is applied locally. Counts are kept in memory and, when `store` is given,
+    in a SQLiteCache so they survive restarts.
+    """
+
+    name = 'learned'
+
+    def __init__(self, store=None, min_support=3, min_confidence=0.8):
+        self.store = store
+        self.min_support = min_support
+        self.min_confidence = min_confidence
+        self._patterns = {}
+        self._lock = threading.Lock()
+
+    def rewrite(self, query, relevant_preferences):
+        counts = self._load(self._prefs_key(relevant_preferences))
+        if not counts:
+            return None
+
+        pattern, support = max(counts.items(), key=lambda item: item[1])
+        if support < self.min_support or support / sum(counts.values()) < self.min_confidence:
+            return None
+
+        position, words = pattern.split('|', 1)
+        if f" {words} " in f" {normalize_query(query)} ":
+            return query
+        return f"{words} {query}" if position == 'prefix' else f"{query} {words}"
+
+    def observe(self, query, relevant_preferences, result):
+        pattern = self._pattern(query, result)
+        if pattern is None:
+            return
+
+        key = self._prefs_key(relevant_preferences)
+        with self._lock:
+            counts = dict(self._load(key))
+            counts[pattern] = counts.get(pattern, 0) + 1
+            self._patterns[key] = counts
+        if self.store is not None:
+            try:
+                self.store.set(key, counts)
+            except Exception as e:
+                logger.warning("Could not persist learned rewrite pattern: %s", e)
+
+    @staticmethod
+    def _prefs_key(relevant_preferences):
+        return ','.join(sorted({pref.strip().lower() for pref in relevant_preferences}))
+
+    @staticmethod
+    def _pattern(query, result):
+        query_tokens = normalize_query(query).split()
+        result_tokens = normalize_query(result).split()
+        extra = len(result_tokens) - len(query_tokens)
+        if extra <= 0:
+            return None
+        if result_tokens[extra:] == query_tokens:
+            return 'prefix|' + ' '.join(result_tokens[:extra])
+        if result_tokens[:len(query_tokens)] == query_tokens:
+            return 'suffix|' + ' '.join(result_tokens[len(query_tokens):])
+        return None
+
+    def _load(self, key):
+        counts = self._patterns.get(key)
+        if counts is None and self.store is not None:
+            try:
+                entry = self.store.get(key)
+            except Exception as e:
+                logger.warning("Could not read learned rewrite patterns: %s", e)
+                entry = None
+            counts = entry[0] if entry else {}
+            with self._lock:
+                self._patterns.setdefault(key, counts)
+        return counts or {}
+
+class LLMTier:
+    """
+    The fallback tier: always answers, by calling `rewrite(query, relevant_preferences)`.
+    """
+
+    name = 'llm'
+
+    def __init__(self, rewrite):
+        self._rewrite = rewrite
+
+    def rewrite(self, query, relevant_preferences):
+        return self._rewrite(query, relevant_preferences)
@@ -12,3 +12,33 @@ document.addEventListener("DOMContentLoaded", () => {
         }, index * 100); // Stagger animations
     });
 });
+
+// Type-ahead suggestions for inputs with data-suggest-url, filled into their datalist
+document.addEventListener("DOMContentLoaded", () => {
+    document.querySelectorAll("input[data-suggest-url]").forEach((input) => {
+        const list = document.getElementById(input.getAttribute("list"));
+        let timer = null;
+        let pending = null;
+
+        input.addEventListener("input", () => {
+            clearTimeout(timer);
+            timer = setTimeout(() => {
+                if (pending) {
+                    pending.abort(); // Only the latest keystroke's answer matters
+                }
+                pending = new AbortController();
+                const url = `${input.dataset.suggestUrl}?q=${encodeURIComponent(input.value)}`;
+                fetch(url, { signal: pending.signal, credentials: "same-origin" })
+                    .then((response) => response.json())
+                    .then((data) => {
+                        list.replaceChildren(...data.suggestions.map((suggestion) => {
+                            const option = document.createElement("option");
+                            option.value = suggestion.query;
+                            return option;
+                        }));
+                    })
+                    .catch(() => {});
+            }, 100);
+        });
+    });
+});
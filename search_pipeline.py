@@ -0,0 +1,57 @@
+# search_pipeline.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Concurrent personalise + search pipeline
+# ---------------------------
+
+# The upstream clients are blocking, so each stage runs on this pool. A dedicated
+# executor (rather than the loop's default one) means asyncio.run() never waits
+# for a stage that has already missed its deadline; it finishes in the background
+# and still warms the caches.
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='search-pipeline')
+
+async def run_search_pipeline(query, preferences, page, rewrite, search,
+                              rewrite_timeout=1.5, search_timeout=5.0, hedge=True):
+    """
+    Personalise `query` and fetch its results, overlapping the two upstream calls.
+
+    While `rewrite(query, preferences)` is in flight, the unmodified query is
+    fetched speculatively with `search(query, page)` (when `hedge` is set). If the
+    rewrite misses `rewrite_timeout`, or the rewritten search misses
+    `search_timeout`, the original query's results are used instead.
+
+    Returns `(final_query, results, total)`.
+    """
+    loop = asyncio.get_running_loop()
+
+    original = loop.run_in_executor(_executor, search, query, page) if hedge else None
+    rewritten = loop.run_in_executor(_executor, rewrite, query, preferences)
+
+    final_query = await _within(rewritten, rewrite_timeout, 'rewrite', default=query)
+    if final_query != query:
+        modified = loop.run_in_executor(_executor, search, final_query, page)
+        outcome = await _within(modified, search_timeout, 'search')
+        if outcome is not None:
+            return final_query, outcome[0], outcome[1]
+        logger.info("Falling back to original query '%s'", query)
+        final_query = query
+
+    if original is None:
+        original = loop.run_in_executor(_executor, search, query, page)
+    outcome = await _within(original, search_timeout, 'search', default=([], 0))
+    return final_query, outcome[0], outcome[1]
+
+async def _within(future, timeout, stage, default=None):
+    """
+    Await `future` for at most `timeout` seconds without cancelling the underlying work.
+    """
+    try:
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Search pipeline %s stage missed its %.2fs deadline", stage, timeout)
+        return default
@@ -0,0 +1,200 @@
+# serpapi_client.py
+import logging
+import os
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Errors
+# ---------------------------
+
+class SerpApiError(Exception):
+    """Raised when SerpApi cannot return results for a request."""
+
+class CircuitOpenError(SerpApiError):
+    """Raised without contacting SerpApi while the circuit breaker is open."""
+
+# ---------------------------
+# Circuit breaker
+# ---------------------------
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that keeps failing.
+
+    After `failure_threshold` consecutive failures the circuit opens and calls
+    fail immediately for `reset_timeout` seconds. The first call after that is
+    let through as a trial (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """
+        Return True if a call may go ahead now.
+        """
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                if self.opened_at is None:
+                    logger.warning("SerpApi circuit opened after %d consecutive failures", self.failures)
+                self.opened_at = time.monotonic()
+
+# ---------------------------
+# Client
+# ---------------------------
+
+# Statuses worth retrying; everything else in 4xx is the caller's problem.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class SerpApiClient:
+    """
+    Thin SerpApi HTTP client with a pooled keep-alive session per process,
+    connect/read timeouts, jittered retries on 429/5xx and a circuit breaker.
+    """
+
+    def __init__(self, api_key, base_url='https://serpapi.com', connect_timeout=3.05, read_timeout=10.0,
+                 max_retries=2, backoff=0.25, pool_size=10, breaker=None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+        self.rejected = 0
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        # One session per process: pooled sockets must not be shared across fork().
+        if self._session is None or self._session_pid != os.getpid():
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    # Imported here so the app starts without loading requests/urllib3
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    self._session = session
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def search(self, params):
+        """
+        Run a search and return the decoded JSON response.
+        Raises CircuitOpenError while the breaker is open and SerpApiError on failure.
+        """
+        if not self.breaker.allow():
+            self._count('rejected')
+            raise CircuitOpenError("SerpApi circuit breaker is open")
+
+        import requests
+
+        params = dict(params, api_key=self.api_key, output='json')
+        url = f"{self.base_url}/search.json"
+        attempt = 0
+        while True:
+            self._count('requests')
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except requests.RequestException as e:
+                error, retry_after = SerpApiError(f"SerpApi request failed: {e}"), None
+            else:
+                if response.status_code < 400:
+                    self.breaker.record_success()
+                    return response.json()
+                if response.status_code not in RETRY_STATUSES:
+                    # Bad key, bad parameters: retrying will not help, and SerpApi is healthy.
+                    self.breaker.record_success()
+                    self._count('errors')
+                    raise SerpApiError(f"SerpApi returned {response.status_code}: {_error_message(response)}")
+                error = SerpApiError(f"SerpApi returned {response.status_code}: {_error_message(response)}")
+                retry_after = _retry_after(response)
+
+            if attempt >= self.max_retries:
+                self.breaker.record_failure()
+                self._count('errors')
+                raise error
+
+            # Full jitter: sleep a random amount up to the exponential backoff ceiling.
+            delay = retry_after if retry_after is not None else random.uniform(0, self.backoff * 2 ** attempt)
+            logger.info("Retrying SerpApi in %.2fs after: %s", delay, error)
+            self._count('retries')
+            time.sleep(delay)
+            attempt += 1
+
+    def stats(self):
+        """
+        HTTP attempts, retries, failed searches, calls refused by the breaker, and its state.
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'circuit': self.breaker.state,
+            }
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+def _error_message(response):
+    try:
+        return response.json().get('error', response.reason)
+    except ValueError:
+        return response.reason
+
+def _retry_after(response, limit=5.0):
+    try:
+        return min(float(response.headers['Retry-After']), limit)
+    except (KeyError, ValueError):
+        return None
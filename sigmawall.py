@@ -1,6 +1,6 @@
 import os
 import logging
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import (
     LoginManager,
@@ -11,11 +11,11 @@ from flask_login import (
     login_required
 )
 from flask_caching import Cache
-from flask_migrate import Migrate
 from dotenv import load_dotenv
-from serpapi import GoogleSearch  # Correct import
-import openai  # Correct import
 from werkzeug.security import generate_password_hash, check_password_hash  # For password hashing
+from config import Config
+from db_engine import configure_sqlite_engine, configure_sqlite_connections
+from logging_setup import configure_logging
 
 # ---------------------------
 # Configuration and Setup
@@ -26,26 +26,30 @@ load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.config.from_object(Config)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your_default_secret_key')  # Replace with a strong secret key
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'  # SQLite database
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+configure_sqlite_engine(app)  # Pool sizing
 
 # Initialize Extensions
 db = SQLAlchemy(app)
-migrate = Migrate(app, db)
+with app.app_context():
+    configure_sqlite_connections(db.engine, app.config)  # WAL and pragmas
+if os.environ.get('FLASK_RUN_FROM_CLI') == 'true':
+    # Only the `flask db` commands need Flask-Migrate, and it imports all of Alembic.
+    from flask_migrate import Migrate
+    migrate = Migrate(app, db)
 cache = Cache(app, config={'CACHE_TYPE': 'simple'})
 login_manager = LoginManager(app)
-login_manager.login_view = 'login'  # Redirect to 'login' page if not authenticated
+login_manager.login_view = 'main.login'  # Redirect to 'login' page if not authenticated
+bp = Blueprint('main', __name__)  # Same endpoint names as app.py, so both can share the templates
 
-# Configure Logging
-logging.basicConfig(
-    filename='app.log',
-    level=logging.DEBUG,  # Set to DEBUG for detailed logs during development
-    format='%(asctime)s %(levelname)s %(name)s %(message)s'
-)
+# Logging is configured by whoever runs the app (see the __main__ block)
+logger = logging.getLogger(__name__)
 
 # Load API Keys
-openai.api_key = os.getenv('OPENAI_API_KEY')  # Ensure this is set in your .env file
+openai_api_key = os.getenv('OPENAI_API_KEY')  # Ensure this is set in your .env file
 serpapi_api_key = os.getenv('SERPAPI_API_KEY')  # Ensure this is set in your .env file
 
 # ---------------------------
@@ -75,12 +79,10 @@ class Search(db.Model):
     author_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     author = db.relationship('User', backref=db.backref('searches', lazy=True))
 
-# ---------------------------
-# Create the Database Tables
-# ---------------------------
-
-with app.app_context():
-    db.create_all()
+    __table_args__ = (
+        # Serves per-user history ordered newest first
+        db.Index('ix_search_author_timestamp', author_id, timestamp.desc()),
+    )
 
 # ---------------------------
 # User Loader for Flask-Login
@@ -111,15 +113,17 @@ def get_user_preferences(user):
     top_preferences = [word for word, count in sorted_words[:10]]  # Top 10 preferences
 
     preferences = ', '.join(top_preferences)
-    logging.debug(f"Inferred Preferences for User {user.username}: {preferences}")
+    logger.debug("Inferred Preferences for User %s: %s", user.username, preferences)
     return preferences
 
 def modify_query_with_preferences(query, preferences):
     """
     Modify the original query based on user preferences using OpenAI's GPT model.
     """
-    logging.debug(f"Modifying query: '{query}' with preferences: '{preferences}'")
+    logger.debug("Modifying query: '%s' with preferences: '%s'", query, preferences)
     try:
+        import openai  # Imported on first use; the SDK is slow to import
+        openai.api_key = openai_api_key
         response = openai.ChatCompletion.create(
             model="gpt-4",  # Use 'gpt-3.5-turbo' or 'gpt-4'
             messages=[
@@ -140,10 +144,10 @@ def modify_query_with_preferences(query, preferences):
             max_tokens=100
         )
         modified_query = response['choices'][0]['message']['content'].strip()
-        logging.debug(f"Modified query: {modified_query}")
+        logger.debug("Modified query: %s", modified_query)
         return modified_query
     except Exception as e:
-        logging.error(f"Error modifying query: {e}", exc_info=True)
+        logger.error("Error modifying query: %s", e, exc_info=True)
         return query  # Fallback to original query
 
 def serpapi_search(query, page):
@@ -158,6 +162,7 @@ def serpapi_search(query, page):
         "start": (page - 1) * 10,
         "format": "json"
     }
+    from serpapi import GoogleSearch  # Imported on first use
     search = GoogleSearch(params)  # Use the correct class
     try:
         results_json = search.get_dict()
@@ -172,14 +177,14 @@ def serpapi_search(query, page):
         total = int(results_json.get('search_information', {}).get('total_results', 0))
         return results, total
     except Exception as e:
-        logging.error(f"Error during search: {e}", exc_info=True)
+        logger.error("Error during search: %s", e, exc_info=True)
         return [], 0
 
 # ---------------------------
 # Routes
 # ---------------------------
 
-@app.route('/register', methods=['GET', 'POST'])
+@bp.route('/register', methods=['GET', 'POST'])
 def register():
     """
     User registration route.
@@ -190,11 +195,11 @@ def register():
 
         if not username or not password:
             flash('Username and password are required.', 'warning')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
 
         if User.query.filter_by(username=username).first():
             flash('Username already exists!', 'danger')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
 
         new_user = User(username=username)
         new_user.set_password(password)  # Hash the password
@@ -202,11 +207,11 @@ def register():
         db.session.commit()
 
         flash('Account created! Please log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     return render_template('register.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     """
     User login route.
@@ -219,12 +224,12 @@ def login():
         if user and user.check_password(password):  # Check hashed password
             login_user(user)
             flash('Logged in successfully!', 'success')
-            return redirect(url_for('profile'))
+            return redirect(url_for('main.profile'))
 
         flash('Invalid username or password.', 'danger')
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     """
@@ -232,9 +237,9 @@ def logout():
     """
     logout_user()
     flash('Logged out successfully!', 'info')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
 
-@app.route('/profile')
+@bp.route('/profile')
 @login_required
 def profile():
     """
@@ -242,7 +247,7 @@ def profile():
     """
     return render_template('profile.html', user=current_user)
 
-@app.route('/set_preferences', methods=['GET', 'POST'])
+@bp.route('/set_preferences', methods=['GET', 'POST'])
 @login_required
 def set_preferences():
     """
@@ -253,10 +258,10 @@ def set_preferences():
         current_user.preferences = preferences
         db.session.commit()
         flash('Preferences updated!', 'success')
-        return redirect(url_for('profile'))
+        return redirect(url_for('main.profile'))
     return render_template('set_preferences.html', preferences=current_user.preferences or '')
 
-@app.route('/clear_learning')
+@bp.route('/clear_learning')
 @login_required
 def clear_learning():
     """
@@ -265,9 +270,9 @@ def clear_learning():
     current_user.preferences = None
     db.session.commit()
     flash('Preferences cleared!', 'info')
-    return redirect(url_for('profile'))
+    return redirect(url_for('main.profile'))
 
-@app.route('/search_history')
+@bp.route('/search_history')
 @login_required
 def search_history():
     """
@@ -276,29 +281,29 @@ def search_history():
     history = Search.query.filter_by(author=current_user).order_by(Search.timestamp.desc()).all()
     return render_template('search_history.html', history=history)
 
-@app.route('/', methods=['GET', 'POST'])
+@bp.route('/', methods=['GET', 'POST'])
 def search():
     """
     Home route displaying the search form.
     """
-    logging.debug("Entered '/' route with method: %s", request.method)
+    logger.debug("Entered '/' route with method: %s", request.method)
     if request.method == 'POST':
         query = request.form.get('query', '').strip()
-        logging.debug("Received POST request with query: '%s'", query)
+        logger.debug("Received POST request with query: '%s'", query)
         if not query:
             flash('Please enter a search query.', 'warning')
-            return redirect(url_for('search'))
+            return redirect(url_for('main.search'))
 
         if current_user.is_authenticated and current_user.preferences:
-            logging.debug(f"User preferences found: {current_user.preferences}")
+            logger.debug("User preferences found: %s", current_user.preferences)
             query = modify_query_with_preferences(query, current_user.preferences)
-            logging.debug(f"Final query after modification: {query}")
+            logger.debug("Final query after modification: %s", query)
 
-        return redirect(url_for('results', query=query))
-    logging.debug("Rendering 'index.html' for GET request.")
+        return redirect(url_for('main.results', query=query))
+    logger.debug("Rendering 'index.html' for GET request.")
     return render_template('index.html')
 
-@app.route('/results')
+@bp.route('/results')
 @login_required
 @cache.cached(timeout=60, query_string=True)
 def results():
@@ -306,10 +311,10 @@ def results():
     Route to display search results.
     """
     query = request.args.get('query', '').strip()
-    logging.debug("Entered '/results' route with query: '%s'", query)
+    logger.debug("Entered '/results' route with query: '%s'", query)
     if not query:
         flash('No query provided.', 'warning')
-        return redirect(url_for('search'))
+        return redirect(url_for('main.search'))
 
     page = request.args.get('page', 1, type=int)
     results, total = serpapi_search(query, page)
@@ -325,22 +330,26 @@ def results():
 # Error Handlers
 # ---------------------------
 
-@app.errorhandler(404)
+@bp.app_errorhandler(404)
 def page_not_found(e):
     return render_template('404.html'), 404
 
-@app.errorhandler(405)
+@bp.app_errorhandler(405)
 def method_not_allowed(e):
     return render_template('405.html'), 405
 
-@app.errorhandler(500)
+@bp.app_errorhandler(500)
 def internal_error(e):
     db.session.rollback()
     return render_template('500.html'), 500
 
+app.register_blueprint(bp)
+
 # ---------------------------
 # Run the Application
 # ---------------------------
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # Development server only; production runs gunicorn against wsgi.py.
+    configure_logging(app.config)
+    app.run(debug=os.environ.get('FLASK_DEBUG', '1') == '1')
@@ -0,0 +1,120 @@
+# similarity.py
+from difflib import SequenceMatcher
+
+# ---------------------------
+# Query similarity measures
+# ---------------------------
+#
+# Every measure returns a ratio in [0, 1]. Those that take a `threshold` may
+# stop early once the result is known to fall below it; the value returned
+# then is an upper bound that is itself below the threshold, so comparisons
+# against the threshold are still exact.
+
+def sequence_ratio(a, b, threshold=0.0):
+    """
+    difflib's SequenceMatcher ratio, behind the cheap prefilter.
+    """
+    # SequenceMatcher's autojunk heuristic kicks in at 200 characters, after which
+    # the containment shortcut would no longer match ratio() exactly.
+    quick = _prefilter(a, b, threshold, _sequence_bounds, exact_containment=max(len(a), len(b)) < 200)
+    if quick is not None:
+        return quick
+    matcher = SequenceMatcher(None, a, b)
+    # quick_ratio() and real_quick_ratio() are upper bounds that cost far less than ratio()
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return matcher.quick_ratio()
+    return matcher.ratio()
+
+def token_jaccard(a, b, threshold=0.0):
+    """
+    Jaccard similarity of the two queries' lower-cased word sets.
+
+    The smaller set over the larger bounds it from above (equality when one
+    contains the other), so set sizes alone settle pairs below `threshold`.
+    """
+    if a == b:
+        return 1.0
+    tokens_a = set(a.lower().split())
+    tokens_b = set(b.lower().split())
+    if not tokens_a and not tokens_b:
+        return 1.0
+    bound = min(len(tokens_a), len(tokens_b)) / max(len(tokens_a), len(tokens_b))
+    if bound < threshold:
+        return bound
+    return len(tokens_a & tokens_b) / len(tokens_a | tokens_b)
+
+def levenshtein_ratio(a, b, threshold=0.0):
+    """
+    1 - edit distance / length of the longer string.
+
+    The dynamic programme gives up as soon as every cell of a row exceeds the
+    largest distance that could still reach `threshold`.
+    """
+    quick = _prefilter(a, b, threshold, _levenshtein_bounds)
+    if quick is not None:
+        return quick
+
+    longest = max(len(a), len(b))
+    max_distance = int((1 - threshold) * longest)
+    if len(a) < len(b):
+        a, b = b, a
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            ))
+        if min(current) > max_distance:
+            return 1 - min(current) / longest
+        previous = current
+    return 1 - previous[-1] / longest
+
+METHODS = {
+    'sequence': sequence_ratio,
+    'jaccard': token_jaccard,
+    'levenshtein': levenshtein_ratio,
+}
+
+def similarity(a, b, method='sequence', threshold=0.0):
+    """
+    Compare two queries with the named measure.
+    """
+    return METHODS[method](a, b, threshold)
+
+# ---------------------------
+# Prefilter
+# ---------------------------
+
+def _sequence_bounds(short, long):
+    # With `short` inside `long`, the longest match is all of `short`.
+    return 2 * len(short) / (len(short) + len(long))
+
+def _levenshtein_bounds(short, long):
+    # With `short` inside `long`, the edit distance is the length difference.
+    return len(short) / len(long)
+
+def _prefilter(a, b, threshold, containment_ratio, exact_containment=True):
+    """
+    Settle the obvious cases without running the full measure.
+
+    Equal strings are 1.0. When one string contains the other (a rewrite that
+    only adds words to the original query), the ratio has a closed form. When
+    the lengths alone put the ratio below `threshold`, the bound is returned.
+    Returns None when the full measure is needed.
+    """
+    if a == b:
+        return 1.0
+    if not a or not b:
+        return 0.0
+    short, long = (a, b) if len(a) <= len(b) else (b, a)
+    if exact_containment and short in long:
+        return containment_ratio(short, long)
+    # Both measures are bounded above by their containment value.
+    bound = containment_ratio(short, long)
+    if bound < threshold:
+        return bound
+    return None
@@ -0,0 +1,113 @@
+# singleflight.py
+import hashlib
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl  # Cross-process locking is only available on Unix
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Request coalescing
+# ---------------------------
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait and receive the same result (or exception). With `lock_dir`
+    set, the leader also takes a file lock so leaders in other worker processes
+    queue behind it, and `recheck()` gives them a chance to pick up the value
+    the first process just stored instead of calling upstream again.
+    """
+
+    LOCK_STRIPES = 256  # Lock files are shared by hashed key, so their number stays fixed
+
+    def __init__(self, name, lock_dir=None, lock_timeout=10.0):
+        self.name = name
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        self.leaders = 0
+        self.shared = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None):
+        """
+        Return `fn()`, sharing one execution among concurrent callers with the same key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._run_leader(key, fn, recheck)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self):
+        with self._lock:
+            return {'leaders': self.leaders, 'shared': self.shared, 'in_flight': len(self._calls)}
+
+    def _run_leader(self, key, fn, recheck):
+        if not self.lock_dir:
+            return fn()
+
+        stripe = int(hashlib.sha1(key.encode()).hexdigest(), 16) % self.LOCK_STRIPES
+        path = os.path.join(self.lock_dir, f"{self.name}-{stripe}.lock")
+        with open(path, 'a') as lock_file:
+            locked = self._acquire(lock_file)
+            try:
+                if recheck is not None:
+                    value = recheck()
+                    if value is not None:
+                        return value
+                return fn()
+            finally:
+                if locked:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire(self, lock_file):
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    # Better a duplicate upstream call than a stuck request.
+                    logger.warning("Timed out waiting for %s lock; proceeding without it", self.name)
+                    return False
+                time.sleep(0.02)
@@ -0,0 +1,301 @@
+# suggest.py
+import bisect
+import heapq
+import logging
+import threading
+import time
+from collections import Counter
+
+from cache_store import LRUCache
+from result_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Prefix index
+# ---------------------------
+
+def _successor(prefix):
+    """
+    The smallest string greater than every string that starts with `prefix`.
+    """
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1) if prefix else '\U0010ffff'
+
+class PrefixIndex:
+    """
+    Completions ranked by count, over a sorted array of distinct queries.
+
+    A prefix's completions are one contiguous range of the array, found with
+    bisect. Prefixes whose range holds more than `scan_limit` queries have their
+    top `top_k` precomputed; narrower ones are answered by scanning the range.
+
+    Counts only grow, so add() keeps each precomputed list exact by comparing the
+    updated query with the list's weakest entry. Readers take no lock: writers
+    replace the key array and top-k lists rather than changing them in place, so
+    a reader works on one consistent snapshot of each.
+    """
+
+    def __init__(self, counts=None, top_k=10, scan_limit=64):
+        self.top_k = top_k
+        self.scan_limit = scan_limit
+        self._counts = dict(counts or {})
+        self._keys = sorted(self._counts)
+        self._top = {}
+        self._lock = threading.Lock()
+        self._precompute()
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def precomputed(self):
+        """
+        Number of prefixes with a precomputed top-k list.
+        """
+        return len(self._top)
+
+    def count(self, query):
+        return self._counts.get(query, 0)
+
+    def complete(self, prefix):
+        """
+        Return up to `top_k` queries starting with `prefix`, most frequent first.
+        """
+        top = self._top.get(prefix)
+        if top is not None:
+            return top
+        keys = self._keys
+        lo, hi = self._range(keys, prefix)
+        if hi - lo > self.scan_limit:
+            # The range has grown past scan_limit since the index was built.
+            with self._lock:
+                keys = self._keys
+                lo, hi = self._range(keys, prefix)
+                top = self._top[prefix] = self._best(keys, lo, hi)
+            return top
+        return self._best(keys, lo, hi)
+
+    def add(self, query, amount=1):
+        """
+        Count `amount` more searches for `query`.
+        """
+        with self._lock:
+            if query not in self._counts:
+                keys = list(self._keys)
+                bisect.insort(keys, query)
+                self._keys = keys
+            self._counts[query] = self._counts.get(query, 0) + amount
+            key = self._sort_key(query)
+            for end in range(len(query) + 1):
+                top = self._top.get(query[:end])
+                if top is None:
+                    continue
+                if query in top or len(top) < self.top_k or key < self._sort_key(top[-1]):
+                    self._top[query[:end]] = sorted(set(top) | {query}, key=self._sort_key)[:self.top_k]
+
+    def _sort_key(self, query):
+        return -self._counts[query], query
+
+    @staticmethod
+    def _range(keys, prefix):
+        lo = bisect.bisect_left(keys, prefix)
+        return lo, bisect.bisect_left(keys, _successor(prefix), lo)
+
+    def _best(self, keys, lo, hi):
+        return heapq.nsmallest(self.top_k, keys[lo:hi], key=self._sort_key)
+
+    def _precompute(self):
+        """
+        Walk the prefixes depth first, storing the top-k of every range wider than scan_limit.
+        """
+        keys = self._keys
+        stack = [('', 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if hi - lo <= self.scan_limit:
+                continue
+            self._top[prefix] = self._best(keys, lo, hi)
+            depth = len(prefix)
+            start = lo + 1 if len(keys[lo]) == depth else lo  # The prefix itself sorts first
+            while start < hi:
+                child = keys[start][:depth + 1]
+                end = bisect.bisect_left(keys, _successor(child), start, hi)
+                stack.append((child, start, end))
+                start = end
+
+# ---------------------------
+# Type-ahead suggestions
+# ---------------------------
+
+def normalize_prefix(text):
+    """
+    Normalise typed text like normalize_query(), keeping one trailing space so a
+    finished word only completes to queries with another word after it.
+    """
+    prefix = normalize_query(text)
+    return prefix + ' ' if prefix and text[-1:].isspace() else prefix
+
+class Suggester:
+    """
+    Type-ahead completions: the user's own past queries first, then queries
+    popular across all users.
+
+    The popular index counts the distinct users who searched each query, so
+    one user repeating a query cannot make it popular, and queries reach
+    other users only once `min_count` people have searched them. It is built
+    from the search table on first use and then follows new rows by id,
+    polled at most every `refresh_interval` seconds in a background thread.
+    Polling the table rather than hooking this process's writes means every
+    worker sees every worker's searches. Users' own indexes are loaded on
+    demand into an LRU and kept current by the same poll.
+
+    The loaders do the database work:
+      load_counts() -> (last_id, [(normalized query, distinct authors), ...]) over rows up to last_id
+      load_since(after_id, limit) -> [(id, author_id, query), ...] ordered by id
+      load_user(user_id, through_id) -> [(query, count), ...] over rows up to through_id
+    """
+
+    def __init__(self, load_counts, load_since, load_user, top_k=10, min_count=2, refresh_interval=2.0,
+                 max_users=1000, scan_limit=64, batch_size=5000):
+        self.load_counts = load_counts
+        self.load_since = load_since
+        self.load_user = load_user
+        self.top_k = top_k
+        self.min_count = min_count
+        self.refresh_interval = refresh_interval
+        self.scan_limit = scan_limit
+        self.batch_size = batch_size
+        self._popular = None
+        self._users = LRUCache(max_users)
+        self._last_id = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self._refresh_lock = threading.Lock()
+        self._lock = threading.Lock()  # Held while applying rows and while loading a user
+
+    def suggest(self, text, user_id=None, limit=None):
+        """
+        Return up to `limit` completions of `text` as `{'query', 'source'}` dicts,
+        where source is 'history' or 'popular'.
+        """
+        limit = min(limit or self.top_k, self.top_k)
+        prefix = normalize_prefix(text)
+        self._maybe_refresh()
+        if not prefix:
+            return []
+
+        suggestions = []
+        seen = set()
+        if user_id is not None:
+            for query in self._user_index(user_id).complete(prefix)[:limit]:
+                suggestions.append({'query': query, 'source': 'history'})
+                seen.add(query)
+        popular = self._popular
+        if popular is not None:
+            for query in popular.complete(prefix):
+                if len(suggestions) >= limit:
+                    break
+                # Queries few people have searched may be personal; their authors still see them as history.
+                if query not in seen and popular.count(query) >= self.min_count:
+                    suggestions.append({'query': query, 'source': 'popular'})
+        return suggestions
+
+    def stats(self):
+        popular = self._popular
+        return {
+            'queries': len(popular) if popular is not None else 0,
+            'precomputed_prefixes': popular.precomputed if popular is not None else 0,
+            'cached_users': len(self._users),
+            'last_id': self._last_id or 0,
+        }
+
+    def refresh(self):
+        """
+        Build the popular index, or apply the rows added since the last refresh.
+
+        A row counts towards the popular index only if its author had not
+        searched the query before. Authors' earlier queries come from their
+        cached index, or are loaded once per batch for authors not cached.
+        """
+        if self._popular is None:
+            self._build()
+            return
+        while True:
+            rows = self.load_since(self._last_id, self.batch_size)
+            if not rows:
+                return
+            with self._lock:
+                earlier = {}  # author_id -> set of queries, for authors without a cached index
+                for search_id, author_id, query in rows:
+                    query = normalize_query(query)
+                    if not query:
+                        continue
+                    user_index = self._users.get(author_id)
+                    if user_index is not None:
+                        new_author = user_index.count(query) == 0
+                        user_index.add(query)
+                    else:
+                        if author_id not in earlier:
+                            earlier[author_id] = {
+                                normalize_query(earlier_query)
+                                for earlier_query, _ in self.load_user(author_id, self._last_id)
+                            }
+                        new_author = query not in earlier[author_id]
+                        earlier[author_id].add(query)
+                    if new_author:
+                        self._popular.add(query)
+                self._last_id = rows[-1][0]
+            if len(rows) < self.batch_size:
+                return
+
+    def _build(self):
+        start = time.monotonic()
+        last_id, rows = self.load_counts()
+        counts = Counter()
+        for query, count in rows:
+            counts[normalize_query(query)] += count
+        counts.pop('', None)
+        popular = PrefixIndex(counts, self.top_k, self.scan_limit)
+        with self._lock:
+            self._popular = popular
+            self._last_id = last_id
+            # Indexes loaded before now may be missing rows the poll will not replay.
+            self._users.clear()
+        logger.info("Built suggestion index: %d queries through search id %d in %.2fs",
+                    len(popular), last_id, time.monotonic() - start)
+
+    def _user_index(self, user_id):
+        user_index = self._users.get(user_id)
+        if user_index is not None:
+            return user_index
+        with self._lock:
+            user_index = self._users.get(user_id)
+            if user_index is None:
+                counts = Counter()
+                for query, count in self.load_user(user_id, self._last_id):
+                    counts[normalize_query(query)] += count
+                counts.pop('', None)
+                user_index = PrefixIndex(counts, self.top_k, self.scan_limit)
+                self._users.set(user_id, user_index)
+        return user_index
+
+    def _maybe_refresh(self):
+        now = time.monotonic()
+        if self._refreshing or now - self._checked_at < self.refresh_interval:
+            return
+        with self._refresh_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            self._checked_at = now
+
+        def run():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.warning("Suggestion index refresh failed: %s", e)
+            finally:
+                self._refreshing = False
+                self._checked_at = time.monotonic()
+
+        threading.Thread(target=run, daemon=True).start()
@@ -0,0 +1,154 @@
+# taxonomy.py
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------
+# Phrase matching
+# ---------------------------
+
+class PhraseTrie:
+    """
+    Token-level trie of multi-word phrases, for finding phrases inside a query in one pass.
+    """
+
+    def __init__(self, phrases=()):
+        self.root = {}
+        for phrase in phrases:
+            self.add(phrase)
+
+    def add(self, phrase):
+        node = self.root
+        for token in phrase.lower().split():
+            node = node.setdefault(token, {})
+        node[None] = phrase.lower()  # Terminal marker
+
+    def find_all(self, tokens):
+        """
+        Return the set of phrases that occur as contiguous token runs in `tokens`.
+        """
+        found = set()
+        for start in range(len(tokens)):
+            node = self.root
+            for token in tokens[start:]:
+                node = node.get(token)
+                if node is None:
+                    break
+                if None in node:
+                    found.add(node[None])
+        return found
+
+# ---------------------------
+# Contextual preference taxonomy
+# ---------------------------
+
+class _CompiledTaxonomy:
+    """
+    Reverse index from trigger word to the preferences it makes relevant.
+    Multi-word triggers go into a trie; single words into a plain dict.
+    """
+
+    def __init__(self, mapping):
+        self.preferences = frozenset(pref.strip().lower() for pref in mapping)
+        self.phrase_trie = PhraseTrie(self.preferences)
+        self.word_index = {}
+        self.phrase_index = {}
+        phrase_triggers = PhraseTrie()
+
+        for pref, triggers in mapping.items():
+            pref = pref.strip().lower()
+            for trigger in triggers:
+                trigger = ' '.join(trigger.lower().split())
+                index = self.phrase_index if ' ' in trigger else self.word_index
+                index.setdefault(trigger, set()).add(pref)
+                if ' ' in trigger:
+                    phrase_triggers.add(trigger)
+
+        self.word_index = {word: frozenset(prefs) for word, prefs in self.word_index.items()}
+        self.phrase_triggers = phrase_triggers if self.phrase_index else None
+
+class Taxonomy:
+    """
+    The contextual preference taxonomy, loaded from a JSON file of
+    {"preference": ["trigger", ...]} and compiled into a reverse index.
+
+    The file is re-read when its modification time changes (checked at most
+    every `reload_interval` seconds), so categories can be edited without a
+    restart. A file that fails to load on reload is logged and ignored.
+    """
+
+    def __init__(self, path, reload_interval=2.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._mtime = os.path.getmtime(path)
+        self._compiled = self._compile()
+        self._checked_at = time.monotonic()
+
+    @property
+    def preferences(self):
+        return self._current().preferences
+
+    @property
+    def phrase_trie(self):
+        """
+        Trie of preference names, for finding preferences already named in a query.
+        """
+        return self._current().phrase_trie
+
+    def relevant_preferences(self, preferences_list, query_tokens):
+        """
+        Return the preferences from `preferences_list` that a query token triggers,
+        in the order the user listed them.
+        """
+        compiled = self._current()
+        triggered = set()
+        for token in set(query_tokens):
+            prefs = compiled.word_index.get(token)
+            if prefs:
+                triggered |= prefs
+        if compiled.phrase_triggers is not None:
+            for phrase in compiled.phrase_triggers.find_all(query_tokens):
+                triggered |= compiled.phrase_index[phrase]
+
+        if not triggered:
+            return []
+        seen = set()
+        relevant = []
+        for pref in preferences_list:
+            if pref in triggered and pref not in seen:
+                seen.add(pref)
+                relevant.append(pref)
+        return relevant
+
+    def _current(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.reload_interval:
+            self._maybe_reload(now)
+        return self._compiled
+
+    def _maybe_reload(self, now):
+        with self._lock:
+            if now - self._checked_at < self.reload_interval:
+                return
+            self._checked_at = now
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime == self._mtime:
+                    return
+                self._compiled = self._compile()
+                self._mtime = mtime
+                logger.info("Reloaded taxonomy from %s (%d preferences)", self.path, len(self._compiled.preferences))
+            except (OSError, ValueError) as e:
+                logger.error("Could not reload taxonomy from %s: %s", self.path, e)
+
+    def _compile(self):
+        with open(self.path, encoding='utf-8') as f:
+            mapping = json.load(f)
+        if not isinstance(mapping, dict):
+            raise ValueError("Taxonomy must be a JSON object of preference -> trigger words")
+        return _CompiledTaxonomy(mapping)
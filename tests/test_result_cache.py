@@ -0,0 +1,60 @@
+# tests/test_result_cache.py
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import serpapi_client  # noqa: E402
+from app import build_serpapi_params, create_app, result_key, serpapi_search_entry  # noqa: E402
+from config import Config  # noqa: E402
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """
+    Replace SerpApi with a stub that records each call and numbers its results.
+    """
+    calls = []
+
+    def search(self, params):
+        calls.append(params)
+        return {
+            'organic_results': [{'title': f"result {len(calls)}", 'link': 'https://example.com', 'snippet': ''}],
+            'search_information': {'total_results': 1},
+        }
+
+    monkeypatch.setattr(serpapi_client.SerpApiClient, 'search', search)
+    return calls
+
+@pytest.fixture
+def app(tmp_path, upstream):
+    class TestConfig(Config):
+        SERPAPI_API_KEY = 'test'
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'users.db')
+        RESULT_CACHE_PATH = str(tmp_path / 'serp_cache.db')
+        REWRITE_CACHE_PATH = ''
+        LOG_FILE = str(tmp_path / 'app.log')
+        RESULT_CACHE_TTL = 1
+
+    return create_app(TestConfig)
+
+def test_stale_hit_refreshes_in_background(app, upstream):
+    query, page = 'wireless headset', 1
+    key = result_key(query, page, build_serpapi_params(query, page))
+    result_cache = app.extensions['services'].result_cache
+
+    with app.test_request_context():
+        results, _, first_version = serpapi_search_entry(query, page)
+        time.sleep(1.1)  # Past RESULT_CACHE_TTL, within the stale window
+        stale_results, _, stale_version = serpapi_search_entry(query, page)
+
+    # The stale page is served straight away...
+    assert (stale_results, stale_version) == (results, first_version)
+    # ...and replaced by a refetch off the request thread.
+    deadline = time.monotonic() + 5
+    while result_cache.get_fresh(key) is None and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert len(upstream) == 2
+    assert result_cache.get_fresh(key)['results'][0]['name'] == 'result 2'
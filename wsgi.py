@@ -0,0 +1,9 @@
+# wsgi.py
+"""
+WSGI entry point for production serving:
+
+    gunicorn -c gunicorn.conf.py wsgi:application
+"""
+from app import create_app
+
+application = create_app()